@@ -1,9 +1,10 @@
 """Draw a sankey diagram using data from a given input file. ###
 """
 import sys
-from ezgraphics import GraphicsWindow
 import random
 import math
+import bisect
+from array import array
 
 WIDTH = 1000        # Width of the window in pixels #####
 HEIGHT = 700        # Height of the window in pixels #####
@@ -13,6 +14,19 @@ COLOURS = [(230, 25, 75), (60, 180, 75), (255, 225, 25), (0, 130, 200), ###
 (210,	245,	60),	(250,	190, 212), (0, 128,	128),	(220, 190, 255), ###
 (170, 110, 40), (255, 250, 200), (128, 0, 0), (170, 255, 195), ###
 (128,	128,	0), (255, 215, 180), (0, 0, 128), (128, 128, 128)] ###
+CHAR_WIDTH = 7      # Estimated width of one character of label text in pixels
+TEXT_HEIGHT = 14        # Estimated height of one line of label text in pixels
+LABEL_ROWS = 3      # Number of rows labels can be staggered across
+LABEL_PAD = 4       # Minimum horizontal gap between two labels in pixels
+CROSSING_SWEEPS = 4     # Most ordering sweeps used to reduce crossing flows
+RESIZE_DELAY = 30       # Wait after the last resize event before redrawing, ms
+BLIT = False        # Show the diagram as one image rather than as many lines
+RESIZE_SCALE = True     # Scale the image on resize (approximate) instead of redrawing
+HOVER_STRIPS = 32       # Strips the flows are split into to find them on hover
+HOVER_COLUMNS = 256     # Columns each strip is split into to find flows on hover
+HOVER_BATCH = 2000      # Flows added to the hover index between handling events
+CURVED = True       # Draw the flows curved (Additional Challenge 1) or straight
+PARALLEL_MIN_BYTES = 1 << 20     # Smallest file read_file_parallel splits up
 
 def read_file(file_name):
     """Opens and reads the file. Returns the title, left-hand axis label and 
@@ -45,7 +59,7 @@ def read_file(file_name):
     ##added to a list.
     raw_list = []
     for x in range(2, number_lines):
-        raw_list.append(nth_line[x].strip("/n"))
+        raw_list.append(nth_line[x].strip("\n"))
     return title, axis, raw_list
 
 def set_up_graph(title):
@@ -59,6 +73,9 @@ def set_up_graph(title):
         win (GraphicsWindow): reference to the window.
     """
     
+    #ezgraphics (and with it Tk) is only imported once a window is actually
+    ##needed, so reading and processing the data works without a display.
+    from ezgraphics import GraphicsWindow
     win = GraphicsWindow(WIDTH, HEIGHT)
     win.setTitle(title)
     return win
@@ -88,8 +105,525 @@ def parse_value (value, line_number) :
               f"({value})")
     return float(value)
     
+def import_numpy():
+    """Imports NumPy for the paths that can make use of it. NumPy is optional,
+    so it is only imported the first time it is asked for.
+
+    Returns:
+        numpy (module): The numpy module, or None if it is not installed.
+    """
+
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+class NameTable:
+    """Stores a column of names as one UTF-8 buffer and the offset at which
+    each name ends, rather than as one string object per name. A name is
+    only turned back into a string when it is asked for.
+
+    Attributes:
+        data (bytearray): The encoded names, one after another.
+        ends (array): Offset just past the end of each name in data.
+    """
+
+    __slots__ = ("data", "ends")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.ends = array("I")
+
+    def __len__(self):
+        return len(self.ends)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i = i + len(self.ends)
+        end = self.ends[i]
+        if i == 0:
+            return self.data[0:end].decode("utf-8")
+        return self.data[self.ends[i - 1]:end].decode("utf-8")
+
+    def __iter__(self):
+        for i in range(0, len(self.ends)):
+            yield self[i]
+
+    def append(self, name):
+        """Adds a name to the end of the table.
+
+        Args:
+            name (string): The name to be stored.
+        """
+
+        self.data += name.encode("utf-8")
+        #The offsets are kept as 4 byte integers until the names no longer
+        ##fit in 4 GiB.
+        if len(self.data) > 0xFFFFFFFF and self.ends.typecode == "I":
+            self.ends = array("Q", self.ends)
+        self.ends.append(len(self.data))
+
+class FlowModel:
+    """Stores the flows read from the file as compact columns rather than as
+    a pair of dictionaries. Each destination costs 8 bytes for its value and
+    4 bytes plus the UTF-8 length of its name in a NameTable. The RGB columns
+    are only filled in once a colour is given, at 4 bytes a destination.
+
+    While every line flows from the axis label, flow i simply runs to
+    destination i with the value values[i], so the edge columns are left as
+    None and only the number of those flows is kept. The columns are built
+    the first time a line names its own source, and from then on each flow
+    costs a further 16 bytes. A line such as "Flow123, 4.5" comes to about
+    20 bytes, against about 215 for the two dictionaries and the name string
+    they held.
+
+    Attributes:
+        names (NameTable): Name of each destination, for example each
+                           country.
+        values (array): The total value flowing into each destination as a
+                        float64 column.
+        rgb (bytearray): Packed N x 3 uint8 array of the RGB selections made
+                         in the file. Unused components are 0. Empty until a
+                         colour is given.
+        rgb_len (bytearray): How many RGB values were given for each
+                             destination (0 -> 3), so the selection can be
+                             rebuilt. Empty until a colour is given.
+        source_names (NameTable): Name of each source block. The first
+                                  source is empty and stands for the
+                                  left-hand axis label on line 2 of the file.
+        axis_edges (integer): Number of flows from the axis label kept
+                              without edge columns.
+        edge_sources (array): Source index of each flow, or None.
+        edge_dests (array): Destination index of each flow, or None.
+        edge_values (array): The value of each flow as a float64 column, or
+                             None.
+    """
+
+    __slots__ = ("names", "values", "rgb", "rgb_len", "source_names",
+                 "axis_edges", "edge_sources", "edge_dests", "edge_values")
+
+    def __init__(self):
+        self.names = NameTable()
+        self.values = array("d")
+        self.rgb = bytearray()
+        self.rgb_len = bytearray()
+        self.source_names = NameTable()
+        self.source_names.append("")
+        self.axis_edges = 0
+        self.edge_sources = None
+        self.edge_dests = None
+        self.edge_values = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def add_source(self, name):
+        """Adds a source block and returns its index.
+
+        Args:
+            name (string): Name of the source block.
+
+        Returns:
+            index (integer): Position of the source in source_names.
+        """
+
+        self.source_names.append(name)
+        return len(self.source_names) - 1
+
+    def add_destination(self, name):
+        """Adds a destination with no flows and returns its index.
+
+        Args:
+            name (string): Name of the destination.
+
+        Returns:
+            index (integer): Position of the destination in names.
+        """
+
+        self.names.append(name)
+        self.values.append(0)
+        if self.rgb_len:
+            self.rgb.extend(bytes(3))
+            self.rgb_len.append(0)
+        return len(self.names) - 1
+
+    def set_colours(self, dest, colours, current_line):
+        """Stores the RGB selection made in the file for a destination.
+
+        Args:
+            dest (integer): Position of the destination in names.
+            colours (list): The RGB selection made in the file.
+            current_line (integer): Stores current position in text file.
+
+        Raises:
+            Exception: If more than three RGB values are given or they are
+                       not within the range of 0 -> 255.
+        """
+
+        #The RGB selection is packed into three bytes so it is checked here
+        ##rather than when the colours are chosen.
+        if len(colours) > 3:
+            raise Exception(f"\nError in line {current_line}: Check that the "
+                            "number of values provided for RGB selection does "
+                            "not exceed three.")
+        for x in colours:
+            if (x > 255) or (x < 0):
+                raise Exception(f"\nError in line {current_line}: Check that "
+                                "the values provided for the RGB selection "
+                                "are within the correct range of 0 -> 255.")
+        #Nothing needs storing for an empty selection until the first colour
+        ##is given, as the columns would only hold zeros.
+        if not self.rgb_len:
+            if len(colours) == 0:
+                return
+            self.rgb = bytearray(3 * len(self.names))
+            self.rgb_len = bytearray(len(self.names))
+        self.rgb[dest * 3:dest * 3 + 3] = bytes(colours) + bytes(3 -
+                                                                len(colours))
+        self.rgb_len[dest] = len(colours)
+
+    def store_edges(self):
+        """Builds the edge columns from the flows from the axis label, so
+        that flows which do not fit that pattern can be added."""
+
+        if self.edge_values is not None:
+            return
+        self.edge_sources = array("I", bytes(4 * self.axis_edges))
+        self.edge_dests = array("I", range(0, self.axis_edges))
+        self.edge_values = array("d", self.values[0:self.axis_edges])
+
+    def add_edge(self, source, dest, value, index=None):
+        """Adds a flow from a source to a destination, or replaces the flow at
+        the given index if that pair has already been seen.
+
+        Args:
+            source (integer): Position of the source in source_names.
+            dest (integer): Position of the destination in names.
+            value (float): Value of the flow.
+            index (integer): Position of the flow to replace, or None.
+
+        Returns:
+            index (integer): Position of the flow in the edge columns.
+        """
+
+        if index is None:
+            if (self.edge_values is None and source == 0 and
+                    dest == self.axis_edges):
+                index = self.axis_edges
+                self.axis_edges = self.axis_edges + 1
+            else:
+                self.store_edges()
+                self.edge_sources.append(source)
+                self.edge_dests.append(dest)
+                self.edge_values.append(value)
+                index = len(self.edge_values) - 1
+        elif self.edge_values is None:
+            self.values[dest] = 0
+        else:
+            self.values[dest] = self.values[dest] - self.edge_values[index]
+            self.edge_values[index] = value
+        self.values[dest] = self.values[dest] + value
+        return index
+
+    def add_edges(self, sources, dests, values):
+        """Adds many flows at once. None of the source/destination pairs may
+        already be in the model or appear twice.
+
+        Args:
+            sources (list): Position of the source of each flow.
+            dests (list): Position of the destination of each flow.
+            values (array): Value of each flow.
+
+        Returns:
+            start (integer): Position of the first new flow in the edge
+                             columns.
+        """
+
+        start = self.edge_count()
+        if (self.edge_values is None and not any(sources) and
+                dests == list(range(start, start + len(dests)))):
+            self.axis_edges = start + len(dests)
+        else:
+            self.store_edges()
+            self.edge_sources.extend(sources)
+            self.edge_dests.extend(dests)
+            self.edge_values.extend(values)
+        #Each value is added on in order, as add_edge would, so the totals
+        ##come out exactly the same.
+        totals = self.values
+        for dest, value in zip(dests, values):
+            totals[dest] = totals[dest] + value
+        return start
+
+    def edge_count(self):
+        """Returns the number of flows in the model."""
+
+        if self.edge_values is None:
+            return self.axis_edges
+        return len(self.edge_values)
+
+    def edge(self, index):
+        """Returns one flow of the model.
+
+        Args:
+            index (integer): Position of the flow.
+
+        Returns:
+            source (integer): Position of the source in source_names.
+            dest (integer): Position of the destination in names.
+            value (float): Value of the flow.
+        """
+
+        if self.edge_values is None:
+            return 0, index, self.values[index]
+        return (self.edge_sources[index], self.edge_dests[index],
+                self.edge_values[index])
+
+    def edge_columns(self):
+        """Returns the source, destination and value of every flow as three
+        columns which can be indexed by flow. While every flow is from the
+        axis label the columns are made up on the spot rather than stored.
+
+        Returns:
+            sources (sequence): Source index of each flow.
+            dests (sequence): Destination index of each flow.
+            values (sequence): The value of each flow.
+        """
+
+        if self.edge_values is None:
+            return (bytes(self.axis_edges), range(0, self.axis_edges),
+                    memoryview(self.values)[0:self.axis_edges])
+        return self.edge_sources, self.edge_dests, self.edge_values
+
+    def colour_spec(self, i):
+        """Returns the RGB selection made in the file for one destination.
+
+        Args:
+            i (integer): Number representing which destination we are at.
+
+        Returns:
+            colours (list): The RGB selection, as it was given in the file.
+        """
+
+        if not self.rgb_len:
+            return []
+        return list(self.rgb[i * 3:i * 3 + self.rgb_len[i]])
+
+    def values_view(self):
+        """Returns a zero-copy view of the destination values column."""
+
+        return memoryview(self.values)
+
+    def rgb_view(self):
+        """Returns a zero-copy N x 3 view of the packed RGB column. If no
+        colours were given the view is of a new column of zeros."""
+
+        rgb = self.rgb if self.rgb_len else bytes(3 * len(self.names))
+        return memoryview(rgb).cast("B", (len(self.names), 3))
+
+    def as_numpy(self):
+        """Returns zero-copy NumPy views of the values and RGB columns. If no
+        colours were given the RGB array is a new array of zeros.
+
+        Returns:
+            values (ndarray): float64 array of the destination values.
+            rgb (ndarray): uint8 array of shape (N, 3).
+            (None, None) is returned if NumPy is not installed.
+        """
+
+        numpy = import_numpy()
+        if numpy is None:
+            return None, None
+        values = numpy.frombuffer(self.values, dtype=numpy.float64)
+        if not self.rgb_len:
+            return values, numpy.zeros((len(self.names), 3), dtype=numpy.uint8)
+        rgb = numpy.frombuffer(self.rgb, dtype=numpy.uint8).reshape(-1, 3)
+        return values, rgb
+
+def parse_line(line, current_line):
+    """Reads the source, destination, value and any RGB selection from one
+    data line. The line is either "destination, value[, rgb]", which flows
+    from the left-hand axis label, or "source -> destination, value[, rgb]".
+
+    Args:
+        line (string): One line of data from the file.
+        current_line (integer): Stores current position in text file.
+
+    Raises:
+        ValueError: raised if there are errors in the data values in the line
+
+        Exception: raised if data is missing.
+
+    Returns:
+        source_name (string): Name of the source, or None for the axis label.
+        value_name (string): Name of the destination.
+        final_value (float): Value of the flow.
+        temp_colours (list): Any RGB selection made on the line.
+    """
+
+    #The entries in each line have any new line characters removed.
+    cleaned = line.replace("\n", "")
+    #The entries are then split by using commas as a divider.
+    cleaned = ((cleaned.split(",")))
+    #If the first entry holds "->" the line names its own source, which is
+    ##taken off the front so the rest reads like any other line.
+    source_name = None
+    if "->" in cleaned[0]:
+        source_name, dest_name = cleaned[0].split("->", 1)
+        source_name = source_name.strip()
+        if source_name == "":
+            raise Exception(f"\nError in line {current_line}: The source "
+                            "provided is empty.")
+        elif "->" in dest_name:
+            raise Exception(f"\nError in line {current_line}: Only one "
+                            "source can be given for each line.")
+        cleaned[0] = dest_name.strip()
+    value_name = str((cleaned[0]))
+    value_before_check = (cleaned[1]).replace(" ", "")
+    #Here the entries are checked to ensure that they are not empty and that
+    ##they are not full of only whitespaces. The program will stop if they
+    ###are.
+    if (value_name.isspace()):
+        raise Exception(f"\nError in line {current_line}: The key provided"
+                        " is empty.")
+    elif value_name == "" or value_before_check == "":
+       raise Exception(f"\nError in line {current_line}: Entries are "
+                       "missing for either one of, or both the key "
+                       "and value.")
+    #The value is checked to ensure it is a float:
+    final_value = parse_value(value_before_check, current_line)
+    
+    #If after the data value, there are RGB selections made, they will need
+    ##to be checked that they are integers before being added to the model.
+    if len(cleaned) > 2:
+        temp_colours = []
+        for remaining in range(2, (len(cleaned))):
+            try:
+                int(cleaned[remaining])
+            except ValueError:
+                print(f"\nError in line {current_line}: Ensure that the "
+                      "values entered to select the RGB are all integers.")
+            temp_colours.append(int(cleaned[remaining].replace(" ", "")))
+    #If no RGB selection has been made, the colour value will be defined as
+    ##being empty for that line/value.
+    else:
+        temp_colours = []
+    return source_name, value_name, final_value, temp_colours
+
+def add_flow(flows, lookups, source_name, value_name, final_value,
+             temp_colours, current_line):
+    """Adds one parsed line to the model.
+
+    Args:
+        flows (FlowModel): The model being built.
+        lookups (tuple): Dictionaries giving the position of each source
+                         name, destination name and source/destination pair
+                         already in the model, so that a repeated line
+                         replaces the earlier flow.
+        source_name (string): Name of the source, or None for the axis label.
+        value_name (string): Name of the destination.
+        final_value (float): Value of the flow.
+        temp_colours (list): Any RGB selection made on the line.
+        current_line (integer): Stores current position in text file.
+
+    Raises:
+        Exception: raised if there are issues with the RGB selection.
+    """
+
+    source_of, dest_of, edge_of = lookups
+    link_flow(flows, edge_of, source_index(flows, source_of, source_name),
+              dest_index(flows, dest_of, value_name), final_value,
+              temp_colours, current_line)
+
+def source_index(flows, source_of, source_name):
+    """Returns the position of a source in the model, adding it if needed.
+
+    Args:
+        flows (FlowModel): The model being built.
+        source_of (dictionary): Position of each source name already added.
+        source_name (string): Name of the source, or None for the axis label.
+
+    Returns:
+        source (integer): Position of the source in flows.source_names.
+    """
+
+    if source_name is None:
+        return 0
+    if source_name not in source_of:
+        source_of[source_name] = flows.add_source(source_name)
+    return source_of[source_name]
+
+def dest_index(flows, dest_of, value_name):
+    """Returns the position of a destination in the model, adding it if
+    needed.
+
+    Args:
+        flows (FlowModel): The model being built.
+        dest_of (dictionary): Position of each destination name already added.
+        value_name (string): Name of the destination.
+
+    Returns:
+        dest (integer): Position of the destination in flows.names.
+    """
+
+    if value_name not in dest_of:
+        dest_of[value_name] = flows.add_destination(value_name)
+    return dest_of[value_name]
+
+def link_flow(flows, edge_of, source, dest, final_value, temp_colours,
+              current_line):
+    """Adds a flow between a source and destination already in the model.
+
+    Args:
+        flows (FlowModel): The model being built.
+        edge_of (dictionary): Position of each source/destination pair
+                              already in the model.
+        source (integer): Position of the source in flows.source_names.
+        dest (integer): Position of the destination in flows.names.
+        final_value (float): Value of the flow.
+        temp_colours (list): Any RGB selection made on the line.
+        current_line (integer): Stores current position in text file.
+
+    Raises:
+        Exception: raised if there are issues with the RGB selection.
+    """
+
+    #A line from the axis label replaces the colour of its destination,
+    ##as before. A named source only sets it when a colour is given, so
+    ###that other flows into the same destination keep it.
+    if source == 0 or len(temp_colours) > 0:
+        flows.set_colours(dest, temp_colours, current_line)
+    edge_of[(source, dest)] = flows.add_edge(source, dest, final_value,
+                                             edge_of.get((source, dest)))
+
+def add_plain_flows(flows, edge_of, sources, dests, values, pairs):
+    """Adds a run of lines that give no colours and whose source/destination
+    pairs are all new, as link_flow would one line at a time.
+
+    Args:
+        flows (FlowModel): The model being built.
+        edge_of (dictionary): Position of each source/destination pair
+                              already in the model.
+        sources (list): Position of the source of each line.
+        dests (list): Position of the destination of each line.
+        values (array): Value of each line.
+        pairs (list): (source, destination) of each line.
+    """
+
+    start = flows.add_edges(sources, dests, values)
+    edge_of.update(zip(pairs, range(start, start + len(pairs))))
+    #A line from the axis label clears any colour its destination was given
+    ##earlier, which only needs checking once some colour has been given.
+    if flows.rgb_len.count(0) < len(flows.rgb_len):
+        for n in range(0, len(pairs)):
+            if sources[n] == 0 and flows.rgb_len[dests[n]] > 0:
+                flows.set_colours(dests[n], [], 0)
+
 def process_data(data_list):
-    """Returns a dictionary produced by processing the data in the list. 
+    """Returns a FlowModel produced by processing the data in the list. Each
+    line is either "destination, value[, rgb]", which flows from the left-hand
+    axis label, or "source -> destination, value[, rgb]".
 
     Args:
         data_list (list): list containing the data read from the file
@@ -101,64 +635,243 @@ def process_data(data_list):
                    data is missing.
 
     Returns:
-        dictionaries (list): contains two dictionaries, one for any user
-                           specified colours and the other for information
-                           about the flows.
+        flows (FlowModel): contains the sources, destinations, values and any
+                           user specified colours of every flow.
     """
     
     #Only lines after the first two are looked at:
     current_line = 2
-    #Two dictionaries are created, one for any custom colours, one for the data.
-    values_dict = {}
-    colours_dict = {}
-    dictionaries = []
+    flows = FlowModel()
+    #The position of each name and each source/destination pair in the model
+    ##is kept while reading so that a repeated line replaces the earlier
+    ###flow, as it did with the dictionaries.
+    lookups = ({}, {}, {})
     for i in data_list:
         current_line = current_line + 1
-        #The entries in each line have any new line characters removed.
-        cleaned = i.replace("\n", "")
-        #The entries are then split by using commas as a divider.
-        cleaned = ((cleaned.split(",")))
-        value_name = str((cleaned[0]))
-        value_before_check = (cleaned[1]).replace(" ", "")
-        #Here the entries are checked to ensure that they are not empty and that
-        ##they are not full of only whitespaces. The program will stop if they
-        ###are.
-        if (value_name.isspace()):
-            raise Exception(f"\nError in line {current_line}: The key provided"
-                            " is empty.")
-        elif value_name == "" or value_before_check == "":
-           raise Exception(f"\nError in line {current_line}: Entries are "
-                           "missing for either one of, or both the key "
-                           "and value.")
-        #The value is checked to ensure it is a float:
-        final_value = parse_value(value_before_check, current_line)
-        
-        #If after the data value, there are RGB selections made, they will need
-        ##to be checked that they are integers before being added to the colours
-        ##dictionary.
-        if len(cleaned) > 2:
-            temp_colours = []
-            for remaining in range(2, (len(cleaned))):
-                try:
-                    int(cleaned[remaining])
-                except ValueError:
-                    print(f"\nError in line {current_line}: Ensure that the "
-                          "values entered to select the RGB are all integers.")
-                temp_colours.append(int(cleaned[remaining].replace(" ", "")))
-        #If no RGB selection has been made, the colour value will be defined as
-        ##being empty for that line/value.
+        source_name, value_name, final_value, temp_colours = parse_line(
+                                                            i, current_line)
+        add_flow(flows, lookups, source_name, value_name, final_value,
+                 temp_colours, current_line)
+    return flows
+
+def parse_chunk(file_name, start, end):
+    """Parses the data lines between two byte offsets of a file into compact
+    arrays. This runs in a worker process for read_file_parallel.
+
+    Args:
+        file_name (str): file containing the data.
+        start (integer): Offset of the first byte, at the start of a line.
+        end (integer): Offset just past the last byte, at the end of a line.
+
+    Returns:
+        chunk (tuple): (line_count, source_table, dest_table, sources, dests,
+                       values, rgb, rgb_len, special, error_line). Sources
+                       and dests index into the two tables, with source 0
+                       standing for the axis label. rgb holds 3 bytes a line.
+                       special is 1 for each line that gives colours or
+                       repeats a source/destination pair from earlier in the
+                       chunk, and 0 otherwise. error_line is the position
+                       within the chunk of the first line that could not be
+                       read, or -1.
+    """
+
+    import io
+    import contextlib
+    import mmap
+    with open(file_name, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            text = data[start:end].decode("utf-8")
+    lines = text.replace("\r\n", "\n").split("\n")
+    #The chunk ends with a new line character, which leaves an empty string
+    ##after it rather than a line.
+    if lines[-1] == "":
+        lines.pop()
+
+    source_table = [None]
+    dest_table = []
+    source_of = {}
+    dest_of = {}
+    sources = array("I")
+    dests = array("I")
+    values = array("d")
+    rgb = bytearray()
+    rgb_len = bytearray()
+    special = bytearray()
+    pairs = set()
+    error_line = -1
+    #Line numbers are not known here, so any error messages are thrown away.
+    ##The line is read again by read_file_parallel with its real line number,
+    ###which reports the error properly.
+    with contextlib.redirect_stdout(io.StringIO()):
+        for k in range(0, len(lines)):
+            try:
+                source_name, value_name, final_value, temp_colours = (
+                    parse_line(lines[k], 0))
+            except Exception:
+                error_line = k
+                break
+            if len(temp_colours) > 3 or not all(0 <= x <= 255
+                                                for x in temp_colours):
+                error_line = k
+                break
+            if source_name is None:
+                sources.append(0)
+            else:
+                if source_name not in source_of:
+                    source_of[source_name] = len(source_table)
+                    source_table.append(source_name)
+                sources.append(source_of[source_name])
+            if value_name not in dest_of:
+                dest_of[value_name] = len(dest_table)
+                dest_table.append(value_name)
+            dests.append(dest_of[value_name])
+            values.append(final_value)
+            rgb.extend(bytes(temp_colours) + bytes(3 - len(temp_colours)))
+            rgb_len.append(len(temp_colours))
+            pair = (sources[-1], dests[-1])
+            special.append(len(temp_colours) > 0 or pair in pairs)
+            pairs.add(pair)
+    return (len(lines), source_table, dest_table, sources, dests, values,
+            rgb, rgb_len, special, error_line)
+
+def read_file_parallel(file_name, workers=None):
+    """Reads and processes a large file on several cores. This does the work
+    of both read_file and process_data: the file is memory-mapped, the data
+    after the first two lines is split into chunks at line breaks, each chunk
+    is parsed in a worker process and the results are merged in file order.
+
+    Args:
+        file_name (str): file containing the data.
+        workers (integer): Number of worker processes. Uses every core if
+                           None. With one worker, or a file smaller than
+                           PARALLEL_MIN_BYTES, the file is read by read_file
+                           and process_data instead.
+
+    Raises:
+        FileNotFoundError: If file not found or is not readable, 
+                            this exception is raised.
+
+        ValueError: raised if there are errors in the data values in the file
+
+        Exception: raised if there are issues with the RGB selection or if
+                   data is missing.
+
+    Returns:
+        title (string): diagram title.
+        axis (string): left-hand axis label.
+        flows (FlowModel): contains the sources, destinations, values and any
+                           user specified colours of every flow.
+    """
+
+    import mmap
+    import operator
+    import os
+    #Adds ".txt" if the user did not write it.
+    if ".txt" not in file_name:
+        file_name = file_name + str(".txt")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    #Splitting the file up only pays once there are several cores and enough
+    ##data to share between them, so otherwise it is read the usual way.
+    if workers == 1 or os.path.getsize(file_name) < PARALLEL_MIN_BYTES:
+        title, axis, data_list = read_file(file_name)
+        return title, axis, process_data(data_list)
+    with open(file_name, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            #The first two lines are designated as the window title and the
+            ##data label.
+            title_end = data.find(b"\n") + 1
+            axis_end = data.find(b"\n", title_end) + 1
+            title = data[0:title_end].decode("utf-8").replace("\r\n", "\n")
+            axis = (data[title_end:axis_end].decode("utf-8")
+                    .replace("\r\n", "\n"))
+            #The data is split into a few chunks for each worker, moving each
+            ##split point forward to just after the next line break.
+            bounds = [axis_end]
+            number_chunks = workers * 4
+            for k in range(1, number_chunks):
+                split = axis_end + (size - axis_end) * k // number_chunks
+                split = data.find(b"\n", max(split, bounds[-1])) + 1
+                if split == 0:
+                    break
+                bounds.append(split)
+            bounds.append(size)
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunks = list(pool.map(parse_chunk, [file_name] * (len(bounds) - 1),
+                               bounds[:-1], bounds[1:]))
+
+    #The chunks are merged in order, counting lines so that each one keeps
+    ##its real line number for any error messages.
+    flows = FlowModel()
+    lookups = ({}, {}, {})
+    current_line = 2
+    for k in range(0, len(chunks)):
+        (line_count, source_table, dest_table, sources, dests, values, rgb,
+         rgb_len, special, error_line) = chunks[k]
+        #Each chunk's own tables are matched up to the model once, so the
+        ##names do not have to be looked up again for every line. Both tables
+        ###are in the order the names first appear, as process_data would add
+        ####them.
+        source_map = [source_index(flows, lookups[0], name)
+                      for name in source_table]
+        dest_map = [dest_index(flows, lookups[1], name)
+                    for name in dest_table]
+        sources = list(map(source_map.__getitem__, sources))
+        dests = list(map(dest_map.__getitem__, dests))
+        count = len(values)
+        #A chunk that is mostly repeats or coloured lines gains little from
+        ##being added in bulk, so every line in it is marked. Otherwise a
+        ###line repeating a pair from an earlier chunk is marked as well, as
+        ####it replaces that flow.
+        if special.count(1) * 2 > count:
+            special = bytearray(b"\x01") * count
         else:
-            temp_colours = []
-        colours_dict[value_name] = temp_colours
-        value_of_key = final_value
-        values_dict[value_name] = value_of_key
-    dictionaries.append(values_dict)
-    dictionaries.append(colours_dict)
-    return dictionaries
+            pairs = list(zip(sources, dests))
+            if not lookups[2].keys().isdisjoint(pairs):
+                special = bytearray(map(operator.or_, special,
+                                        map(lookups[2].__contains__, pairs)))
+        #The lines between the marked ones are added in bulk, and each run
+        ##of marked lines is added by link_flow one line at a time with the
+        ###real line numbers.
+        n = 0
+        while n < count:
+            marked = special.find(1, n)
+            if marked == -1:
+                marked = count
+            if marked > n:
+                add_plain_flows(flows, lookups[2], sources[n:marked],
+                                dests[n:marked], values[n:marked],
+                                pairs[n:marked])
+            n = special.find(0, marked)
+            if n == -1:
+                n = count
+            for m in range(marked, n):
+                if rgb_len[m] > 0:
+                    temp_colours = list(rgb[m * 3:m * 3 + rgb_len[m]])
+                else:
+                    temp_colours = []
+                link_flow(flows, lookups[2], sources[m], dests[m], values[m],
+                          temp_colours, current_line + m + 1)
+        current_line = current_line + count
+        if error_line >= 0:
+            #The line the worker could not read is read again here, which
+            ##raises the same exception process_data would have.
+            with open(file_name, "rb") as file:
+                file.seek(bounds[k])
+                line = file.read(bounds[k + 1] - bounds[k]).decode("utf-8")
+            line = line.replace("\r\n", "\n").split("\n")[error_line]
+            current_line = current_line + 1
+            add_flow(flows, lookups, *parse_line(line, current_line),
+                     current_line)
+    return title, axis, flows
 
 def colours_select(colours_initial):
     #The extended version of this function can be found below.
-    #Please see line 770 (draw_sankey function) to enable/disable.
+    #Please see the Additional Challenge 2 block in layout_sankey to
+    #enable/disable.
     """Default function to choose the colours of the arrows and title.
 
     Args:
@@ -211,7 +924,8 @@ def colours_select(colours_initial):
 
 def colours_select_extended(colours_initial, current_line):
     #Additional Challenge 2:
-    #Please see line 770 (draw_sankey function) to enable/disable.
+    #Please see the Additional Challenge 2 block in layout_sankey to
+    #enable/disable.
     """Part of Addition Challenge 2. Allows for user specification as to what
     the colours of the arrows (and arrow labels) will be.
 
@@ -376,6 +1090,519 @@ def create_colour_gradient(rgb, height_poly, i):
                               list_indv_gradients[2][z]])
     return rgb_gradients
 
+COLOUR_NAMES = {"black": (0, 0, 0), "white": (255, 255, 255)}
+
+def colour_tuple(colour):
+    """Turns the arguments given to setOutline/setFill into one value, so
+    that the same colour always compares equal however it was given.
+
+    Args:
+        colour (tuple): Either (name,) or (r, g, b).
+
+    Returns:
+        colour (tuple): (r, g, b), or the name if it is not a known colour.
+    """
+
+    if len(colour) == 1:
+        return COLOUR_NAMES.get(colour[0], colour[0])
+    return tuple(colour)
+
+class RecordingCanvas:
+    """Sits in place of the GraphicsWindow canvas and records every draw
+    command, along with the colours in use, in a compact list. The recording
+    can then be optimised and replayed onto any canvas with the same methods,
+    or saved and replayed later without recomputing the diagram.
+
+    Each command is a tuple:
+        ("line", outline, x1, y1, x2, y2)
+        ("span", outline, x1, y, x2, rows): a line repeated down rows rows.
+            When rows is more than 1, x1 and x2 are whole pixels and the
+            span covers x1 up to (not including) x2, as the lines did.
+        ("rect", fill, outline, x, y, width, height)
+        ("poly", fill, outline, coordinates)
+        ("text", outline, anchor, x, y, text)
+
+    Attributes:
+        commands (list): The recorded commands, in drawing order.
+    """
+
+    __slots__ = ("commands", "_fill", "_outline", "_anchor")
+
+    def __init__(self, commands=None):
+        self.commands = [] if commands is None else commands
+        self._fill = COLOUR_NAMES["white"]
+        self._outline = COLOUR_NAMES["black"]
+        self._anchor = "nw"
+
+    def setFill(self, *colour):
+        self._fill = colour_tuple(colour)
+
+    def setOutline(self, *colour):
+        self._outline = colour_tuple(colour)
+
+    def setTextAnchor(self, anchor):
+        self._anchor = anchor
+
+    def drawLine(self, x1, y1, x2, y2):
+        #A line carrying straight on from the last one in the same colour is
+        ##merged into it rather than being recorded separately.
+        if x1 > x2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+        if self.commands:
+            last = self.commands[-1]
+            if (last[0] == "line" and last[1] == self._outline and
+                y1 == y2 == last[3] == last[5] and x1 <= last[4] and
+                x2 >= last[2]):
+                self.commands[-1] = ("line", self._outline, min(x1, last[2]),
+                                     y1, max(x2, last[4]), y2)
+                return
+        self.commands.append(("line", self._outline, x1, y1, x2, y2))
+
+    def drawRect(self, x, y, width, height):
+        self.commands.append(("rect", self._fill, self._outline, x, y, width,
+                              height))
+
+    def drawPolygon(self, *coordinates):
+        self.commands.append(("poly", self._fill, self._outline,
+                              tuple(coordinates)))
+
+    def drawText(self, x, y, text):
+        self.commands.append(("text", self._outline, self._anchor, x, y,
+                              text))
+
+    def optimise(self):
+        """Merges the one pixel high lines used to draw the flows.
+
+        Lines on different pixel rows never cover each other, so within each
+        run of such lines only the order on each row has to be kept. Every
+        row's first line is drawn before every row's second line and so on,
+        with the lines of each colour grouped together. Lines on neighbouring
+        rows that cover the same pixels are then merged into one "span"
+        command, which draws exactly the pixels the lines did.
+        """
+
+        commands = []
+        batch = []
+        for command in self.commands:
+            if (command[0] == "line" and command[3] == command[5] and
+                command[3] == int(command[3])):
+                batch.append(command)
+            else:
+                commands.extend(merge_rows(batch))
+                batch = []
+                commands.append(command)
+        commands.extend(merge_rows(batch))
+        self.commands = commands
+
+    def replay(self, canvas):
+        """Draws the recorded commands onto a canvas, only changing the fill,
+        outline and text anchor when they differ from the last command.
+
+        Args:
+            canvas: Reference to drawing on the GraphicsWindow, or any other
+                    canvas with the same methods.
+        """
+
+        fill = outline = anchor = None
+        for command in self.commands:
+            kind = command[0]
+            if kind == "line" or kind == "text":
+                if command[1] != outline:
+                    outline = command[1]
+                    set_colour(canvas.setOutline, outline)
+            elif kind == "span":
+                if command[1] != outline:
+                    outline = command[1]
+                    set_colour(canvas.setOutline, outline)
+                if command[5] > 1 and command[1] != fill:
+                    fill = command[1]
+                    set_colour(canvas.setFill, fill)
+            else:
+                if command[1] != fill:
+                    fill = command[1]
+                    set_colour(canvas.setFill, fill)
+                if command[2] != outline:
+                    outline = command[2]
+                    set_colour(canvas.setOutline, outline)
+
+            if kind == "line":
+                canvas.drawLine(command[2], command[3], command[4], command[5])
+            elif kind == "span":
+                x1, y, x2, rows = command[2:6]
+                if rows == 1:
+                    canvas.drawLine(x1, y, x2, y)
+                else:
+                    #The rectangle includes its right and bottom edges, so it
+                    ##stops one pixel short of x2 like the lines it replaces.
+                    canvas.drawRect(x1, y, x2 - x1 - 1, rows - 1)
+            elif kind == "rect":
+                canvas.drawRect(command[3], command[4], command[5], command[6])
+            elif kind == "poly":
+                canvas.drawPolygon(*command[3])
+            elif kind == "text":
+                if command[2] != anchor:
+                    anchor = command[2]
+                    canvas.setTextAnchor(anchor)
+                canvas.drawText(command[3], command[4], command[5])
+
+    def save(self, file_name):
+        """Saves the recorded commands to a file so they can be replayed later.
+
+        Args:
+            file_name (str): file to write the commands to.
+        """
+
+        import json
+        with open(file_name, "w") as file:
+            json.dump(self.commands, file, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, file_name):
+        """Reads commands saved by save.
+
+        Args:
+            file_name (str): file containing the commands.
+
+        Returns:
+            recording (RecordingCanvas): The recording, ready to replay.
+        """
+
+        import json
+        with open(file_name, "r") as file:
+            saved = json.load(file)
+        #JSON turns the tuples into lists, so they are turned back.
+        commands = []
+        for command in saved:
+            command = [tuple(x) if isinstance(x, list) else x
+                       for x in command]
+            commands.append(tuple(command))
+        return cls(commands)
+
+def set_colour(setter, colour):
+    """Calls setOutline or setFill with a colour from colour_tuple."""
+
+    if isinstance(colour, tuple):
+        setter(colour[0], colour[1], colour[2])
+    else:
+        setter(colour)
+
+def merge_rows(batch):
+    """Reorders and merges a run of one pixel high lines. See
+    RecordingCanvas.optimise.
+
+    Args:
+        batch (list): "line" commands with whole number y positions.
+
+    Returns:
+        commands (list): The same picture as "line" and "span" commands.
+    """
+
+    #Each line is put in a layer by how many lines came before it on its row.
+    layers = []
+    row_depth = {}
+    for command in batch:
+        depth = row_depth.get(command[3], 0)
+        row_depth[command[3]] = depth + 1
+        if depth == len(layers):
+            layers.append({})
+        layers[depth].setdefault(command[1], []).append(command)
+
+    #A line fills the pixels from round(x1) up to round(x2), so lines are
+    ##merged when those whole pixel positions match. A run of one line keeps
+    ###its own positions.
+    commands = []
+    for layer in layers:
+        for outline, lines in layer.items():
+            lines.sort(key=lambda c: (round(c[2]), round(c[4]), c[3]))
+            run = []
+            for command in lines:
+                x1 = round(command[2])
+                x2 = round(command[4])
+                if (run and x2 > x1 and x1 == round(run[0][2]) and
+                    x2 == round(run[0][4]) and
+                    command[3] == run[0][3] + len(run)):
+                    run.append(command)
+                else:
+                    commands.extend(span_command(run))
+                    run = [command]
+            commands.extend(span_command(run))
+    return commands
+
+def span_command(run):
+    """Turns a run of lines found by merge_rows into a "span" command.
+
+    Args:
+        run (list): "line" commands on neighbouring rows covering the same
+                    pixels, top row first.
+
+    Returns:
+        commands (list): The one "span" command, or nothing for no lines.
+    """
+
+    if len(run) == 0:
+        return []
+    first = run[0]
+    if len(run) == 1:
+        return [("span", first[1], first[2], first[3], first[4], 1)]
+    return [("span", first[1], round(first[2]), first[3], round(first[4]),
+             len(run))]
+
+class SvgCanvas:
+    """A canvas with the same methods as the GraphicsWindow canvas that
+    writes an SVG image, so a recording can be exported without a display.
+
+    Attributes:
+        width (integer): Width of the image in pixels.
+        height (integer): Height of the image in pixels.
+        elements (list): The SVG elements drawn so far.
+    """
+
+    __slots__ = ("width", "height", "elements", "_fill", "_outline",
+                 "_anchor")
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.elements = []
+        self._fill = "rgb(255,255,255)"
+        self._outline = "rgb(0,0,0)"
+        self._anchor = "start"
+
+    def setFill(self, *colour):
+        self._fill = svg_colour(colour_tuple(colour))
+
+    def setOutline(self, *colour):
+        self._outline = svg_colour(colour_tuple(colour))
+
+    def setTextAnchor(self, anchor):
+        self._anchor = "middle" if anchor == "center" else "start"
+
+    def drawLine(self, x1, y1, x2, y2):
+        self.elements.append(f'<line x1="{x1:g}" y1="{y1:g}" x2="{x2:g}" '
+                             f'y2="{y2:g}" stroke="{self._outline}"/>')
+
+    def drawRect(self, x, y, width, height):
+        self.elements.append(f'<rect x="{x:g}" y="{y:g}" width="{width:g}" '
+                             f'height="{height:g}" fill="{self._fill}" '
+                             f'stroke="{self._outline}"/>')
+
+    def drawPolygon(self, *coordinates):
+        points = " ".join(f"{x:g}" for x in coordinates)
+        self.elements.append(f'<polygon points="{points}" '
+                             f'fill="{self._fill}" '
+                             f'stroke="{self._outline}"/>')
+
+    def drawText(self, x, y, text):
+        from xml.sax.saxutils import escape
+        self.elements.append(f'<text x="{x:g}" y="{y:g}" '
+                             f'text-anchor="{self._anchor}" '
+                             'dominant-baseline="middle" '
+                             f'fill="{self._outline}">'
+                             f'{escape(text.strip())}</text>')
+
+    def save(self, file_name):
+        """Writes the image to an SVG file.
+
+        Args:
+            file_name (str): file to write the image to.
+        """
+
+        with open(file_name, "w") as file:
+            file.write('<svg xmlns="http://www.w3.org/2000/svg" '
+                       f'width="{self.width}" height="{self.height}">\n'
+                       f'<rect width="100%" height="100%" fill="white"/>\n')
+            file.write("\n".join(self.elements))
+            file.write("\n</svg>\n")
+
+def svg_colour(colour):
+    """Writes a colour from colour_tuple in SVG form."""
+
+    if isinstance(colour, tuple):
+        return f"rgb({colour[0]},{colour[1]},{colour[2]})"
+    return colour
+
+class RasterCanvas:
+    """A canvas with the same methods as the GraphicsWindow canvas that draws
+    into an RGB framebuffer in memory. Text cannot be drawn without a font,
+    so it is kept to one side and drawn separately by draw_text.
+
+    Attributes:
+        width (integer): Width of the image in pixels.
+        height (integer): Height of the image in pixels.
+        pixels (bytearray): width x height x 3 bytes of RGB, row by row.
+        texts (list): Each text drawn as (x, y, text, colour, anchor).
+    """
+
+    __slots__ = ("width", "height", "pixels", "texts", "_fill", "_outline",
+                 "_anchor")
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(b"\xff" * (width * height * 3))
+        self.texts = []
+        self._fill = COLOUR_NAMES["white"]
+        self._outline = COLOUR_NAMES["black"]
+        self._anchor = "nw"
+
+    def setFill(self, *colour):
+        self._fill = raster_colour(colour_tuple(colour))
+
+    def setOutline(self, *colour):
+        self._outline = raster_colour(colour_tuple(colour))
+
+    def setTextAnchor(self, anchor):
+        self._anchor = anchor
+
+    def fill_row(self, y, x1, x2, colour):
+        """Fills the pixels from x1 up to (not including) x2 on row y."""
+
+        x1 = max(x1, 0)
+        x2 = min(x2, self.width)
+        if x2 <= x1 or y < 0 or y >= self.height:
+            return
+        start = (y * self.width + x1) * 3
+        self.pixels[start:start + (x2 - x1) * 3] = colour * (x2 - x1)
+
+    def drawLine(self, x1, y1, x2, y2):
+        #Lines across one row, which make up almost all of the diagram, are
+        ##filled in one slice. Any other line is stepped along pixel by pixel.
+        if round(y1) == round(y2):
+            self.fill_row(round(y1), round(min(x1, x2)), round(max(x1, x2)),
+                          self._outline)
+            return
+        steps = max(abs(round(x2) - round(x1)), abs(round(y2) - round(y1)))
+        for step in range(0, steps):
+            x = round(x1 + (x2 - x1) * step / steps)
+            self.fill_row(round(y1 + (y2 - y1) * step / steps), x, x + 1,
+                          self._outline)
+
+    def drawRect(self, x, y, width, height):
+        for row in range(round(y), round(y + height) + 1):
+            self.fill_row(row, round(x), round(x + width) + 1, self._fill)
+        if self._outline != self._fill:
+            self.drawLine(x, y, x + width, y)
+            self.drawLine(x, y + height, x + width + 1, y + height)
+            self.drawLine(x, y, x, y + height)
+            self.drawLine(x + width, y, x + width, y + height)
+
+    def drawPolygon(self, *coordinates):
+        points = list(zip(coordinates[0::2], coordinates[1::2]))
+        edges = list(zip(points, points[1:] + points[:1]))
+        top = max(round(min(y for x, y in points)), 0)
+        bottom = min(round(max(y for x, y in points)), self.height - 1)
+        #Each row is filled between pairs of the points where it crosses the
+        ##edges of the polygon, measured through the centre of the row.
+        for row in range(top, bottom + 1):
+            centre = row + 0.5
+            crossings = []
+            for (xa, ya), (xb, yb) in edges:
+                if (ya <= centre < yb) or (yb <= centre < ya):
+                    crossings.append(xa + (centre - ya) * (xb - xa) /
+                                     (yb - ya))
+            crossings.sort()
+            for k in range(0, len(crossings) - 1, 2):
+                self.fill_row(row, round(crossings[k]),
+                              round(crossings[k + 1]), self._fill)
+        for (xa, ya), (xb, yb) in edges:
+            self.drawLine(xa, ya, xb, yb)
+
+    def drawText(self, x, y, text):
+        self.texts.append((x, y, text, self._outline, self._anchor))
+
+    def draw_text(self, canvas):
+        """Draws the text kept by drawText onto another canvas.
+
+        Args:
+            canvas: Reference to drawing on the GraphicsWindow.
+        """
+
+        for x, y, text, colour, anchor in self.texts:
+            canvas.setTextAnchor(anchor)
+            canvas.setOutline(colour[0], colour[1], colour[2])
+            canvas.drawText(x, y, text)
+
+    def scaled(self, width, height):
+        """Returns a copy of the image stretched or shrunk to a new size,
+        taking the nearest pixel for each new one. The text is not copied.
+        This takes time in proportion to the number of pixels, however much
+        was drawn.
+
+        Args:
+            width (integer): Width of the new image in pixels.
+            height (integer): Height of the new image in pixels.
+
+        Returns:
+            raster (RasterCanvas): The new image.
+        """
+
+        import operator
+        raster = RasterCanvas(0, 0)
+        raster.width = width
+        raster.height = height
+        columns = [x * self.width // width for x in range(0, width)]
+        #Neighbouring new pixels mostly come from neighbouring old ones, so
+        ##each row is copied as the few slices where that holds. One
+        ###itemgetter picks out every slice of a row in a single call, and a
+        ####row that is used more than once is only picked out once.
+        pieces = [slice(0, 0)]
+        start = columns[0]
+        end = start + 1
+        for column in columns[1:]:
+            if column == end:
+                end = end + 1
+            else:
+                pieces.append(slice(start * 3, end * 3))
+                start = column
+                end = column + 1
+        pieces.append(slice(start * 3, end * 3))
+        pick = operator.itemgetter(*pieces)
+        row_size = self.width * 3
+        picked = {}
+        new_rows = []
+        for y in range(0, height):
+            row = y * self.height // height
+            if row not in picked:
+                picked[row] = b"".join(pick(self.pixels[row * row_size:
+                                                        (row + 1) * row_size]))
+            new_rows.append(picked[row])
+        raster.pixels = bytearray(b"".join(new_rows))
+        return raster
+
+    def ppm_data(self):
+        """Returns the image as base64 encoded PPM data, which Tk's
+        PhotoImage can read directly."""
+
+        import base64
+        header = f"P6\n{self.width} {self.height}\n255\n".encode()
+        return base64.b64encode(header + self.pixels).decode()
+
+def raster_colour(colour):
+    """Turns a colour from colour_tuple into the 3 bytes of a pixel. Colour
+    names other than those in COLOUR_NAMES are drawn black."""
+
+    if isinstance(colour, tuple):
+        return bytes(colour)
+    return bytes(3)
+
+def blit_raster(window, raster):
+    """Shows a framebuffer on the window's canvas as a single image, with
+    only its text drawn as separate canvas items.
+
+    Args:
+        window (GraphicsWindow): contains the graph
+        raster (RasterCanvas): The diagram drawn as an image.
+    """
+
+    import tkinter
+    tk_canvas = window.canvas()._tkcanvas
+    image = tkinter.PhotoImage(master=tk_canvas, data=raster.ppm_data(),
+                               format="PPM")
+    tk_canvas.create_image(0, 0, image=image, anchor="nw")
+    #Tk only shows the image while Python still holds a reference to it.
+    tk_canvas.sankey_image = image
+    raster.draw_text(window.canvas())
+
 def draw_tri_dest(rgb, border_size, current_x1_dest, current_x2_dest,
                   current_x3_dest, tri_height_min, tri_height_max, canvas):
     """Draws the triangles representing the arrow heads. 
@@ -420,7 +1647,86 @@ def write_tri_dest(inv_rgb, current_x3_dest, tri_height_max, dest_names, i,
     canvas.setOutline(inv_rgb[0], inv_rgb[1], inv_rgb[2])
     canvas.drawText(current_x3_dest,tri_height_max, dest_names[i])
 
-def draw_source_block(source_width, border_size, canvas, source_height):
+def estimate_text_width(text):
+    """Estimates how wide a label will be once it is drawn on the canvas.
+
+    Args:
+        text (string): The label to be measured.
+
+    Returns:
+        width (float): Estimated width of the label in pixels.
+    """
+
+    #Any new line characters left over from the file are not drawn as text.
+    return len(text.strip()) * CHAR_WIDTH
+
+def shorten_label(text, max_width):
+    """Shortens a label so that it fits within the given width.
+
+    Args:
+        text (string): The label to be shortened.
+        max_width (float): Width available for the label in pixels.
+
+    Returns:
+        text (string): The label, shortened with "..." if it was too wide, or
+                       None if not even one character of it would fit.
+    """
+
+    if estimate_text_width(text) <= max_width:
+        return text
+    #The number of characters kept is worked out directly from the available
+    ##width rather than removing one character at a time.
+    keep = int(max_width // CHAR_WIDTH) - 3
+    if keep < 1:
+        return None
+    return text.strip()[0:keep] + "..."
+
+def place_labels(labels):
+    """Places the destination labels so that none of them overlap. Labels
+    that collide are staggered onto the rows below, shortened or hidden.
+
+    Args:
+        labels (list): Each element is a tuple (x, y, text) giving the centre
+                       position the label would normally be drawn at.
+
+    Returns:
+        placed (list): A tuple (x, y, text) for every label in the same order
+                       as the labels list. The text is None for any label
+                       which had to be hidden.
+    """
+
+    #The labels are swept from left to right by their left edge. Every label
+    ##already placed on a row then starts before the current one, so only the
+    ###furthest right edge on each row has to be kept to detect an overlap.
+    ####This keeps the whole pass to one sort plus LABEL_ROWS checks a label.
+    widths = [estimate_text_width(text) for x, y, text in labels]
+    order = sorted(range(len(labels)),
+                   key=lambda k: labels[k][0] - widths[k] / 2)
+    row_ends = {}
+    placed = [None] * len(labels)
+    for k in order:
+        x, y, text = labels[k]
+        left = x - widths[k] / 2
+        rows = [y + r * TEXT_HEIGHT for r in range(0, LABEL_ROWS)]
+        for row_y in rows:
+            if row_ends.get(row_y, -math.inf) + LABEL_PAD <= left:
+                row_ends[row_y] = x + widths[k] / 2
+                placed[k] = (x, row_y, text)
+                break
+        else:
+            #No row has room for the whole label, so it is shortened to fit
+            ##on the row with the most space before it, or hidden if even
+            ###that is not possible.
+            row_y = min(rows, key=lambda row: row_ends.get(row, -math.inf))
+            room = 2 * (x - row_ends.get(row_y, -math.inf) - LABEL_PAD)
+            short_text = shorten_label(text, room)
+            if short_text is not None:
+                row_ends[row_y] = x + estimate_text_width(short_text) / 2
+            placed[k] = (x, row_y, short_text)
+    return placed
+
+def draw_source_block(source_width, border_size, canvas, source_height,
+                      source_x=None):
     """Draws the source block. 
 
     Args:
@@ -428,15 +1734,19 @@ def draw_source_block(source_width, border_size, canvas, source_height):
         border_size (integer): Minimum gap between the diagram ands window edge.
         canvas: Reference to drawing on the GraphicsWindow.    
         source_height (integer): Height of the source block.
+        source_x (float): x position of the left of the block. The block is
+                          centred in the window if None.
     """
     
+    if source_x is None:
+        source_x = (WIDTH - source_width) / 2
     canvas.setOutline("black")
     canvas.setFill("black")
-    canvas.drawRect((WIDTH - source_width) / 2, border_size, source_width,
-                    source_height)
+    canvas.drawRect(source_x, border_size, source_width, source_height)
     
 def source_title_write(title, source_width, is_colours_extended, canvas,
-                       source_height, border_size):
+                       source_height, border_size, source_x=None,
+                       rgb_title=None):
     """Writes the title on the source block. 
 
     Args:
@@ -447,18 +1757,31 @@ def source_title_write(title, source_width, is_colours_extended, canvas,
         canvas: Reference to drawing on the GraphicsWindow.    
         source_height (integer): Height of the source block.
         border_size (integer): Minimum gap between the diagram ands window edge.
+        source_x (float): x position of the left of the block. The block is
+                          centred in the window if None.
+        rgb_title (tuple): Colour already chosen for the title. If given, the
+                           title is not checked for an RGB selection again.
         
     """
 
     #If the extended colours_select function was used. The program will check
     ##for a RGB specification for the axis label by calling another function.
-    if is_colours_extended == True:
+    if rgb_title is not None:
+        pass
+    elif is_colours_extended == True:
         rgb_title, title = src_title_colour_extended(title)
     elif is_colours_extended == False:
         rgb_title = (255, 255, 255)
+    #The title is shortened if it is wider than the source block, or left out
+    ##completely if the block is too narrow to hold any of it.
+    title = shorten_label(title, source_width)
+    if title is None:
+        return
+    if source_x is None:
+        source_x = (WIDTH - source_width) / 2
     canvas.setTextAnchor("center")
     canvas.setOutline(rgb_title[0], rgb_title[1], rgb_title[2])
-    canvas.drawText(((WIDTH - source_width) / 2) + (source_width / 2),
+    canvas.drawText(source_x + (source_width / 2),
                     border_size + (source_height / 2), title)
 
 def src_title_colour_extended(title):
@@ -519,10 +1842,149 @@ def src_title_colour_extended(title):
         rgb_title = (255,255,255)
     return rgb_title, title
 
+def curve_position(along_source_x, current_x1_dest, p):
+    """Finds where a curved line is along the way from its source slot to its
+    destination slot, using the easing from Additional Challenge 1.
+
+    Args:
+        along_source_x (float): x position of the line at the source.
+        current_x1_dest (float): x position of the line at the destination.
+        p (float): How far down the arrow the line is, from 0 to 1.
+
+    Returns:
+        curve (float): x position of the line at that point.
+    """
+
+    curve = p * math.pi - math.pi / 2
+    curve = (math.sin(curve) + 1) / 2
+    return along_source_x - curve * (along_source_x - current_x1_dest)
+
+def straight_position(along_source_x, current_x1_dest, p):
+    """Finds where a straight line is along the way from its source slot to
+    its destination slot, as drawn by draw_straight.
+
+    Args:
+        along_source_x (float): x position of the line at the source.
+        current_x1_dest (float): x position of the line at the destination.
+        p (float): How far down the arrow the line is, from 0 to 1.
+
+    Returns:
+        straight (float): x position of the line at that point.
+    """
+
+    return along_source_x - p * (along_source_x - current_x1_dest)
+
+def count_crossings(edge_order, source_pos, dest_pos, edge_sources,
+                    edge_dests):
+    """Counts how many pairs of flows cross each other.
+
+    Args:
+        edge_order (list): Flow indexes sorted by source then destination
+                           position.
+        source_pos (list): Position of each source along the top.
+        dest_pos (list): Position of each destination along the bottom.
+        edge_sources (sequence): Source index of each flow.
+        edge_dests (sequence): Destination index of each flow.
+
+    Returns:
+        crossings (integer): Number of crossing pairs of flows.
+    """
+
+    #Once the flows are sorted by their source, two of them cross when the
+    ##earlier one goes to a destination further right. These pairs are
+    ###counted with a Fenwick tree over the destination positions.
+    tree = [0] * (len(dest_pos) + 1)
+    crossings = 0
+    seen = 0
+    k = 0
+    while k < len(edge_order):
+        #Flows from the same source never cross, so each source's flows are
+        ##counted before any of them are added to the tree.
+        start = k
+        source = source_pos[edge_sources[edge_order[k]]]
+        while (k < len(edge_order) and
+               source_pos[edge_sources[edge_order[k]]] == source):
+            position = dest_pos[edge_dests[edge_order[k]]] + 1
+            not_after = 0
+            while position > 0:
+                not_after = not_after + tree[position]
+                position = position - (position & -position)
+            crossings = crossings + seen - not_after
+            k = k + 1
+        for e in edge_order[start:k]:
+            position = dest_pos[edge_dests[e]] + 1
+            while position < len(tree):
+                tree[position] = tree[position] + 1
+                position = position + (position & -position)
+        seen = seen + k - start
+    return crossings
+
+def order_flows(flows, sources):
+    """Orders the source blocks and destinations to reduce the number of flows
+    that cross, using barycentric ordering with at most CROSSING_SWEEPS sweeps.
+
+    Args:
+        flows (FlowModel): contains the data for the graph.
+        sources (list): Index of each source that has at least one flow.
+
+    Returns:
+        source_order (list): Source indexes from left to right.
+        dest_order (list): Destination indexes from left to right.
+    """
+
+    edge_sources, edge_dests, edge_values = flows.edge_columns()
+    number_edges = len(edge_values)
+    #The destinations start in the order they were read from the file.
+    ##Python's sort is stable, so with one source nothing is moved.
+    source_order = list(sources)
+    dest_order = list(range(0, len(flows)))
+    source_pos = [0] * len(flows.source_names)
+    dest_pos = list(range(0, len(flows)))
+
+    def edges_by_position():
+        return sorted(range(0, number_edges),
+                      key=lambda e: (source_pos[edge_sources[e]],
+                                     dest_pos[edge_dests[e]]))
+
+    def barycentres(count, ends, other_ends, other_pos):
+        total = [0] * count
+        number = [0] * count
+        for e in range(0, number_edges):
+            total[ends[e]] = total[ends[e]] + other_pos[other_ends[e]]
+            number[ends[e]] = number[ends[e]] + 1
+        return [total[n] / number[n] if number[n] > 0 else 0
+                for n in range(0, count)]
+
+    for position, source in enumerate(source_order):
+        source_pos[source] = position
+    best = (count_crossings(edges_by_position(), source_pos, dest_pos,
+                            edge_sources, edge_dests),
+            list(source_order), list(dest_order))
+    for sweep in range(0, CROSSING_SWEEPS):
+        if best[0] == 0:
+            break
+        #Each source is moved to the average position of its destinations,
+        ##then each destination to the average position of its sources.
+        centre = barycentres(len(flows.source_names), edge_sources,
+                             edge_dests, dest_pos)
+        source_order.sort(key=lambda n: centre[n])
+        for position, source in enumerate(source_order):
+            source_pos[source] = position
+        centre = barycentres(len(flows), edge_dests, edge_sources, source_pos)
+        dest_order.sort(key=lambda n: centre[n])
+        for position, dest in enumerate(dest_order):
+            dest_pos[dest] = position
+        crossings = count_crossings(edges_by_position(), source_pos,
+                                    dest_pos, edge_sources, edge_dests)
+        if crossings >= best[0]:
+            break
+        best = (crossings, list(source_order), list(dest_order))
+    return best[1], best[2]
+
 def draw_curve(height_poly, rgb_gradients, dydx_flow, canvas,
-               along_source_x, current_height, dest_widths, i, current_x1_dest):
-    #Additional Challenge 1: Please see line 800 (draw_sankey function)
-    #                        to enable/disable.
+               along_source_x, current_height, band_width, current_x1_dest):
+    #Additional Challenge 1: Please see the CURVED constant at the top of
+    #                        the file to enable/disable.
     """Draw straight coloured lines connecting the source to the triangles. 
 
     Args:
@@ -537,15 +1999,13 @@ def draw_curve(height_poly, rgb_gradients, dydx_flow, canvas,
         along_source_x (float): Position of left point of each initial coloured
                                 line for every arrow.
         current_height (integer): Bottom of the source block.
-        dest_widths (list): List of each line width (pixels).
-        i (integer): Number representing which key-value pair in the values
-                     dictionary we are at. For example, which country.
-        current_x1_dest (float): x position of the left corner of the triangle
-                                 along the destination.                 
+        band_width (float): Width of the coloured line (pixels).
+        current_x1_dest (float): x position the left point of the line reaches
+                                 at the destination.                 
     """
     
     #Postion of the initial x coordinate of the right point of the line:
-    along_source_x2 = along_source_x + dest_widths[i]
+    along_source_x2 = along_source_x + band_width
     #The for loop will go through each pixel down the distance from the
     ##bottom of the source to the top of the arrow head.
     for x in range(0, height_poly):
@@ -571,13 +2031,9 @@ def draw_curve(height_poly, rgb_gradients, dydx_flow, canvas,
             
             #Additional 1: The given curve equations are used to determine
             ##how much the line should curve as the program goes down the arrow.
-            ratio_height = (x / height_poly)
-            p = ratio_height
-            curve = p * math.pi - math.pi / 2
-            curve = (math.sin(curve) + 1) / 2
-            curve = (along_source_x - curve * (along_source_x -
-                                               current_x1_dest))
-            along_source_x2 = (curve + dest_widths[i])
+            curve = curve_position(along_source_x, current_x1_dest,
+                                   x / height_poly)
+            along_source_x2 = (curve + band_width)
             #This if statement is purely adjusting the last few coloured lines
             ##to make the arrow aesthetically look better by preventing
             ###edges appearing out of place.
@@ -602,8 +2058,8 @@ def draw_curve(height_poly, rgb_gradients, dydx_flow, canvas,
         current_height = current_height + 1
     
 def draw_straight(height_poly, rgb_gradients, dydx_flow, canvas,
-                  along_source_x, current_height, dest_widths, i):
-    #Please see line 800 (draw_sankey function) to enable/disable.
+                  along_source_x, current_height, band_width):
+    #Please see the CURVED constant at the top of the file to enable/disable.
     """Draw straight coloured lines connecting the source to the triangles. 
 
     Args:
@@ -618,14 +2074,12 @@ def draw_straight(height_poly, rgb_gradients, dydx_flow, canvas,
         along_source_x (float): Position of left point of each initial coloured
                                 line for every arrow.
         current_height (integer): Bottom of the source block.
-        dest_widths (list): List of each line width (pixels).
-        i (integer): Number representing which key-value pair in the values
-                     dictionary we are at. For example, which country.
+        band_width (float): Width of the coloured line (pixels).
                                  
     """
     
     #Postion of the initial x coordinate of the right point of the line:
-    along_source_x2 = along_source_x + dest_widths[i]
+    along_source_x2 = along_source_x + band_width
     #The for loop will go through each pixel down the distance from the
     ##bottom of the source to the top of the arrow head.
     for x in range(0, height_poly):
@@ -661,7 +2115,7 @@ def draw_straight(height_poly, rgb_gradients, dydx_flow, canvas,
                 #The left and right x positions of the coloured line are
                 ##determined:
                 along_source_x = along_source_x + delta
-                along_source_x2 = along_source_x + dest_widths[i]
+                along_source_x2 = along_source_x + band_width
             #The black outlines are drawn first.
             x1, y1 = along_source_x - 1, current_height
             x2, y2 = along_source_x2 + 1, current_height
@@ -675,36 +2129,92 @@ def draw_straight(height_poly, rgb_gradients, dydx_flow, canvas,
         ##arrow)
         current_height = current_height + 1
   
-def draw_sankey(window, title, data_dic, gap_size = 100, border_size = 100):
-    """Draw the sankey diagram
+class SankeyLayout:
+    """The finished layout of a sankey diagram. All x positions and widths are
+    fractions of the window width and all y positions are fractions of the
+    window height, so the diagram can be drawn again at any size without
+    parsing the file, choosing colours or creating gradients again.
+
+    Attributes:
+        flows (FlowModel): contains the data for the graph.
+        total_flow (float): Sum of every flow.
+        source_top (float): Top of the source blocks.
+        source_bottom (float): Bottom of the source blocks, where the flows
+                               start.
+        tri_top (float): Top of the triangles, where the flows end.
+        tri_bottom (float): Bottom of the triangles.
+        source_order (list): Source indexes from left to right.
+        source_x (list): Left of each source block.
+        source_widths (list): Width of each source block.
+        source_totals (list): Total flowing out of each source block.
+        source_titles (list): Title written on each source block.
+        title_colours (list): RGB of each source block's title.
+        dest_order (list): Destination indexes from left to right.
+        dest_x (list): Left corner of each destination's triangle.
+        dest_widths (list): Width of each destination's triangle.
+        dest_rgb (list): RGB selection of each destination.
+        dest_inv_rgb (list): Inverse RGB of each destination, for its title.
+        gradients (list): Colour gradient of each destination's flows, as
+                          3 bytes of RGB for each line.
+        dest_edges (list): The flows into each destination, in slot order.
+        edge_source_x (array): Left of each flow at its source.
+        edge_dest_x (array): Left of each flow at its destination.
+        edge_widths (array): Width of each flow.
+    """
+
+    __slots__ = ("flows", "total_flow", "source_top", "source_bottom",
+                 "tri_top", "tri_bottom", "source_order", "source_x",
+                 "source_widths", "source_totals", "source_titles", "title_colours",
+                 "dest_order", "dest_x", "dest_widths", "dest_rgb",
+                 "dest_inv_rgb", "gradients", "dest_edges", "edge_source_x",
+                 "edge_dest_x", "edge_widths")
+
+def layout_sankey(title, data_dic, gap_size = 100, border_size = 100):
+    """Works out the layout of the sankey diagram at the size of the window
+    (WIDTH by HEIGHT) and stores it as fractions of that size.
 
     Args:
-        window (GraphicsWindow): contains the graph
         title (string): contains the label to overlay on the source arrow
-        data_dic (dictionary): contains the data for the graph
+        data_dic (FlowModel): contains the data for the graph
         gap_size (int): number of pixels to leave between destination arrows
         border_size (int): Minimum separation to othe edges of the window
 
     Raises:
         Exception: If the number of available pixels calculated is less than
                    one pixel.
+
+    Returns:
+        layout (SankeyLayout): The layout, ready to be drawn at any size.
     """
 
-    #The values and keys from the first dictionary in the data_dic list are
-    ##added to a list, these values could be country names or sources of
-    ###renwable energy. The keys could be the number of goals or power output.
-    values_data_dic = data_dic[0].values()
-    names_data_dic = data_dic[0].keys()
+    #The values and names are read straight from the columns of the model,
+    ##the names could be country names or sources of renwable energy. The
+    ###values could be the number of goals or power output.
+    values_data_dic = data_dic.values_view()
+    edge_sources, edge_dests, edge_values = data_dic.edge_columns()
+    #The total flowing out of each source is found. Only sources with at
+    ##least one flow are drawn, so the axis label is left out if every line
+    ###names its own source.
+    source_totals = [0] * len(data_dic.source_names)
+    source_used = [False] * len(data_dic.source_names)
+    for e in range(0, len(edge_values)):
+        source_totals[edge_sources[e]] = (source_totals[edge_sources[e]] +
+                                          edge_values[e])
+        source_used[edge_sources[e]] = True
+    sources = [s for s in range(0, len(source_used)) if source_used[s]]
     #Calculations related to representing the data in the right amount of
-    ##pixels.
+    ##pixels. The space is shared out along whichever of the source and
+    ###destination rows has more blocks.
     total_flow = sum(values_data_dic)
     number_dests = len(values_data_dic)
-    avail_pixels = WIDTH - 2 * 100 - (number_dests - 1) * gap_size
+    number_sources = len(sources)
+    number_blocks = max(number_dests, number_sources)
+    avail_pixels = WIDTH - 2 * 100 - (number_blocks - 1) * gap_size
     
     #If there are too many value-key data pairs, sankey diagram will be broken
     ##so an exception is raised if this occurs.
-    suggested_gap = (1 - WIDTH + 2 * 100)/(- (number_dests - 1))
     if avail_pixels < 1:
+        suggested_gap = (1 - WIDTH + 2 * 100)/(- (number_blocks - 1))
         raise Exception("\nError in file: The number of available pixels "
                         "calculated is less than 1 which means the sankey "
                         "diagram will potentially be inverted and/or "
@@ -718,102 +2228,626 @@ def draw_sankey(window, title, data_dic, gap_size = 100, border_size = 100):
     #A for loop is used to create a list of the exact width of each
     ##arrow/bar measured in pixels by multiplying the pixel:flow ratio by
     ###the flow. 
-    dest_widths = []
-    for value in values_data_dic:
-        dest_widths.append(value * pixels_per_flow)
-    
-    dest_names = []
-    for key in names_data_dic:
-        dest_names.append(key)
+    dest_widths = array("d", [value * pixels_per_flow
+                              for value in values_data_dic])
 
     #Geomtry defined for the source block and triangle heights.
-    source_width = (total_flow * pixels_per_flow)
     source_height = 40
     tri_height_min = HEIGHT - border_size
     tri_height_max = HEIGHT - (border_size + border_size / 3)
-    canvas =  window.canvas()
-    
-    #Source block is drawn.
-    draw_source_block(source_width, border_size, canvas, source_height)
-    initial_source_x = (WIDTH - avail_pixels) / 2
+    #The height of the arrow is calculated, from the source bottom to the
+    ##triangle top as height_poly: (Used to draw the right number of 
+    ###coloured lines for each bar.)
+    height_poly = round(tri_height_max - (border_size + source_height)) + 1
+
     current_line = 2
+    dest_rgb = []
+    dest_inv_rgb = []
+    gradients = []
     for i in range(0, number_dests):
         current_line = current_line + 1
-        #The x coordinate of the bottom left corner of each bar is defined:
-        current_x1_dest = border_size + sum(dest_widths[0:i]) + gap_size * (i)
-        #The x coordinate of the top left corner of each bar is defined:
-        along_source_x = initial_source_x + sum(dest_widths[0:i])
-        #The gradients (dy/dx) of each line is calculated.
-        if (along_source_x - current_x1_dest > 0) or (along_source_x -
-        current_x1_dest < 0):
-            dydx_flow = (((border_size + source_height) - tri_height_max) /
-                                         ((along_source_x - current_x1_dest)))
-        else:
-            dydx_flow = 0
-        #The x coordinate of the bottom right corner of each bar is defined:
-        current_x2_dest = current_x1_dest + dest_widths[i]
-        #The x coordinate of the centre of each triangle connected to each
-        ##bar is defined:
-        current_x3_dest = (current_x1_dest + dest_widths[i] / 2)
-
         #Any elements in the text file used to identify the RGB of each
-        ##arrow/title are added to a new colours_list.
-        colours_list = list(data_dic[1].values())[0:len(data_dic[1].values())]
+        ##arrow/title are read back from the model.
+        colours_list = data_dic.colour_spec(i)
 
 ################################################################################
 #######################      Additional Challenge 2:     #######################
 
           #Enable or disable one of the function calls below please:
 
-        #Challenge (Colours Selected or Randomised) Lines 773 -> 774:
+        #Challenge (Colours Selected or Randomised):
         rgb, inv_rgb, is_colours_extended = colours_select_extended(
-                                                 colours_list[i],current_line)
+                                                 colours_list,current_line)
 
-        #Normal (Colours Only Randomised) Line 777:
-        #rgb, inv_rgb, is_colours_extended = colours_select(colours_list[i])
+        #Normal (Colours Only Randomised):
+        #rgb, inv_rgb, is_colours_extended = colours_select(colours_list)
         
         
 ################################################################################
 
-        #The height of the arrow is calculated, from the source bottom to the
-        ##triangle top as height_poly: (Used to draw the right number of 
-        ###coloured lines for each bar.)
-        height_poly = round(tri_height_max - (border_size + source_height)) + 1
-        #The current_height is reset during each iteration for each new
-        ##destination so that the lines are drawn correctly.
-        current_height = border_size + source_height
+        dest_rgb.append(rgb)
+        dest_inv_rgb.append(inv_rgb)
+        #The RGB colour gradients are created and packed into 3 bytes a line,
+        ##rather than kept as one small list per line, as a layout keeps them
+        ###for every destination.
+        gradients.append(bytes([component for rgb_line in
+                                create_colour_gradient(rgb, height_poly, i)
+                                for component in rgb_line]))
+
+    #The sources and destinations are put in the order which crosses the
+    ##fewest flows. With only one source the file order is kept.
+    source_order, dest_order = order_flows(data_dic, sources)
+    source_pos = [0] * len(data_dic.source_names)
+    for position, source in enumerate(source_order):
+        source_pos[source] = position
+    dest_pos = [0] * number_dests
+    for position, dest in enumerate(dest_order):
+        dest_pos[dest] = position
+
+    #The x coordinate of the bottom left corner of each triangle is defined,
+    ##running from the left border:
+    dest_x = [0] * number_dests
+    current_x = border_size + (number_blocks - number_dests) * gap_size / 2
+    for dest in dest_order:
+        dest_x[dest] = current_x
+        current_x = current_x + dest_widths[dest] + gap_size
+    #The x coordinate of the left of each source block is defined, with the
+    ##row of blocks centred in the window:
+    source_x = [0] * len(data_dic.source_names)
+    current_x = (WIDTH - avail_pixels - (number_sources - 1) * gap_size) / 2
+    for source in source_order:
+        source_x[source] = current_x
+        current_x = (current_x + source_totals[source] * pixels_per_flow +
+                     gap_size)
+    #Each flow is given a slot along its source, ordered by destination, and
+    ##a slot along its destination, ordered by source, so that flows leaving
+    ###or arriving at the same block do not cross each other.
+    edge_source_x = array("d", bytes(8 * len(edge_values)))
+    edge_dest_x = array("d", bytes(8 * len(edge_values)))
+    slot_x = list(source_x)
+    for e in sorted(range(0, len(edge_values)),
+                    key=lambda e: (source_pos[edge_sources[e]],
+                                   dest_pos[edge_dests[e]])):
+        edge_source_x[e] = slot_x[edge_sources[e]]
+        slot_x[edge_sources[e]] = (slot_x[edge_sources[e]] +
+                                   edge_values[e] * pixels_per_flow)
+    slot_x = list(dest_x)
+    dest_edges = [[] for dest in range(0, number_dests)]
+    for e in sorted(range(0, len(edge_values)),
+                    key=lambda e: (dest_pos[edge_dests[e]],
+                                   source_pos[edge_sources[e]])):
+        edge_dest_x[e] = slot_x[edge_dests[e]]
+        slot_x[edge_dests[e]] = (slot_x[edge_dests[e]] +
+                                 edge_values[e] * pixels_per_flow)
+        dest_edges[edge_dests[e]].append(e)
+
+    #The title of each source block is found. The axis label is coloured if
+    ##is_colours_extended is true and colours were used, while any named
+    ###sources are written in white.
+    source_titles = [None] * len(data_dic.source_names)
+    title_colours = [None] * len(data_dic.source_names)
+    for source in source_order:
+        if source == 0 and is_colours_extended:
+            title_colours[source], source_titles[source] = (
+                src_title_colour_extended(title))
+        elif source == 0:
+            title_colours[source], source_titles[source] = (255, 255,
+                                                            255), title
+        else:
+            title_colours[source] = (255, 255, 255)
+            source_titles[source] = data_dic.source_names[source]
+
+    #Everything is stored as a fraction of the window size.
+    layout = SankeyLayout()
+    layout.flows = data_dic
+    layout.total_flow = total_flow
+    layout.source_top = border_size / HEIGHT
+    layout.source_bottom = (border_size + source_height) / HEIGHT
+    layout.tri_top = tri_height_max / HEIGHT
+    layout.tri_bottom = tri_height_min / HEIGHT
+    layout.source_order = source_order
+    layout.source_x = [x / WIDTH for x in source_x]
+    layout.source_widths = [total * pixels_per_flow / WIDTH
+                            for total in source_totals]
+    layout.source_totals = source_totals
+    layout.source_titles = source_titles
+    layout.title_colours = title_colours
+    layout.dest_order = dest_order
+    layout.dest_x = [x / WIDTH for x in dest_x]
+    layout.dest_widths = array("d", [width / WIDTH for width in dest_widths])
+    layout.dest_rgb = dest_rgb
+    layout.dest_inv_rgb = dest_inv_rgb
+    layout.gradients = gradients
+    layout.dest_edges = dest_edges
+    layout.edge_source_x = array("d", [x / WIDTH for x in edge_source_x])
+    layout.edge_dest_x = array("d", [x / WIDTH for x in edge_dest_x])
+    layout.edge_widths = array("d", [value * pixels_per_flow / WIDTH
+                                     for value in edge_values])
+    return layout
+
+def resample_gradient(rgb_gradients, height_poly):
+    """Unpacks a colour gradient stored by layout_sankey, stretching or
+    squashing it to a new number of lines rather than creating it again.
 
-        #The RGB colour gradients are created:
-        rgb_gradients = create_colour_gradient(rgb, height_poly, i)
+    Args:
+        rgb_gradients (bytes): The gradient as 3 bytes of RGB for each line.
+        height_poly (integer): Number of lines the gradient must cover.
+
+    Returns:
+        rgb_gradients (list): The RGB of each of the height_poly lines.
+    """
+
+    number_lines = len(rgb_gradients) // 3
+    return [rgb_gradients[n * 3:n * 3 + 3] for n in
+            [x * number_lines // height_poly for x in range(0, height_poly)]]
+
+def rasterise_sankey(layout, canvas, width, height):
+    """Draws a sankey diagram from its layout at the given size.
+
+    Args:
+        layout (SankeyLayout): The layout made by layout_sankey.
+        canvas: Reference to drawing on the GraphicsWindow, or a canvas with
+                the same methods.
+        width (integer): Width to draw the diagram at in pixels.
+        height (integer): Height to draw the diagram at in pixels.
+    """
+
+    border_size = layout.source_top * height
+    source_height = (layout.source_bottom - layout.source_top) * height
+    tri_height_min = layout.tri_bottom * height
+    tri_height_max = layout.tri_top * height
+    #The flows start on a whole pixel row, so that each coloured line fills
+    ##exactly one row.
+    flow_top = round(layout.source_bottom * height)
+    height_poly = round(tri_height_max - flow_top) + 1
+
+    #Source blocks are drawn.
+    for source in layout.source_order:
+        draw_source_block(layout.source_widths[source] * width, border_size,
+                          canvas, source_height,
+                          layout.source_x[source] * width)
+
+    for i in layout.dest_order:
+        current_x1_dest = layout.dest_x[i] * width
+        #The x coordinate of the bottom right corner of each bar is defined:
+        current_x2_dest = current_x1_dest + layout.dest_widths[i] * width
+        #The x coordinate of the centre of each triangle connected to each
+        ##bar is defined:
+        current_x3_dest = (current_x1_dest + current_x2_dest) / 2
+
+        rgb_gradients = resample_gradient(layout.gradients[i], height_poly)
 
         #Triangles for each destination are created:
-        draw_tri_dest(rgb, border_size, current_x1_dest, current_x2_dest,
-                  current_x3_dest, tri_height_min, tri_height_max, canvas)
+        draw_tri_dest(layout.dest_rgb[i], border_size, current_x1_dest,
+                      current_x2_dest, current_x3_dest, tri_height_min,
+                      tri_height_max, canvas)
+
+        for e in layout.dest_edges[i]:
+            #The x coordinates of the top left and bottom left corners of
+            ##each bar are its slots along the source and the destination:
+            along_source_x = layout.edge_source_x[e] * width
+            slot_x1_dest = layout.edge_dest_x[e] * width
+            #The current_height is reset for each bar so that the lines are
+            ##drawn correctly.
+            current_height = flow_top
+            #The gradients (dy/dx) of each line is calculated.
+            if (along_source_x - slot_x1_dest > 0) or (along_source_x -
+            slot_x1_dest < 0):
+                dydx_flow = ((flow_top - tri_height_max) /
+                             ((along_source_x - slot_x1_dest)))
+            else:
+                dydx_flow = 0
+            band_width = layout.edge_widths[e] * width
 
 ################################################################################
 #######################      Additional Challenge 1:     #######################
 
-          #Enable or disable one of the function calls below please:
+          #Set CURVED at the top of the file to choose between them please:
 
-        #Challenge (Curved) Lines 803 -> 805:
-        draw_curve(height_poly, rgb_gradients, dydx_flow, canvas,
-                   along_source_x, current_height, dest_widths, i,
-                   current_x1_dest)
+            #Challenge (Curved):
+            if CURVED:
+                draw_curve(height_poly, rgb_gradients, dydx_flow, canvas,
+                           along_source_x, current_height, band_width,
+                           slot_x1_dest)
 
-        #Normal (Straight) Lines 808 -> 809:
-        #draw_straight(height_poly, rgb_gradients, dydx_flow, canvas,
-                      # along_source_x, current_height, dest_widths, i)
+            #Normal (Straight):
+            else:
+                draw_straight(height_poly, rgb_gradients, dydx_flow, canvas,
+                              along_source_x, current_height, band_width)
 
 ################################################################################
 
-        #Each triangle/arrow-head titles is written:
-        write_tri_dest(inv_rgb, current_x3_dest, tri_height_max, dest_names,
-                       i, canvas)
+    write_layout_text(layout, canvas, width, height)
+
+def write_layout_text(layout, canvas, width, height):
+    """Writes the triangle/arrow-head titles and source titles of a layout
+    at the given size. This is the last part of rasterise_sankey, and is used
+    on its own when the rest of the diagram is already drawn as an image.
+
+    Args:
+        layout (SankeyLayout): The layout made by layout_sankey.
+        canvas: Reference to drawing on the GraphicsWindow, or a canvas with
+                the same methods.
+        width (integer): Width to draw the diagram at in pixels.
+        height (integer): Height to draw the diagram at in pixels.
+    """
+
+    border_size = layout.source_top * height
+    source_height = (layout.source_bottom - layout.source_top) * height
+    tri_height_max = layout.tri_top * height
+    #The position and colour of each triangle/arrow-head title is found so
+    ##that they can all be placed together.
+    label_positions = []
+    label_colours = []
+    for i in layout.dest_order:
+        current_x3_dest = (layout.dest_x[i] + layout.dest_widths[i] / 2) * width
+        label_positions.append((current_x3_dest, tri_height_max,
+                                layout.flows.names[i]))
+        label_colours.append(layout.dest_inv_rgb[i])
+
+    #Each triangle/arrow-head title is written where place_labels has found
+    ##room for it. Hidden titles are skipped.
+    placed_labels = place_labels(label_positions)
+    label_names = [text for x, y, text in placed_labels]
+    for k in range(0, len(placed_labels)):
+        if label_names[k] is not None:
+            write_tri_dest(label_colours[k], placed_labels[k][0],
+                           placed_labels[k][1], label_names, k, canvas)
+
+    #The source titles are written in the colours chosen for them.
+    for source in layout.source_order:
+        source_title_write(layout.source_titles[source],
+                           layout.source_widths[source] * width, False,
+                           canvas, source_height, border_size,
+                           layout.source_x[source] * width,
+                           layout.title_colours[source])
+
+def show_layout(window, layout, width, height):
+    """Draws the layout onto a recording at the given size, then optimises
+    the recording and replays it onto the window's canvas.
+
+    If BLIT is True and the window is backed by Tk, the layout is drawn
+    straight into a framebuffer instead and shown as a single image. No
+    recording is made, so the memory used does not grow with the number of
+    lines drawn.
+
+    Args:
+        window (GraphicsWindow): contains the graph
+        layout (SankeyLayout): The layout made by layout_sankey.
+        width (integer): Width to draw the diagram at in pixels.
+        height (integer): Height to draw the diagram at in pixels.
+
+    Returns:
+        recording (RecordingCanvas): The commands used to draw the diagram,
+                                     or None if it was drawn as an image.
+        raster (RasterCanvas): The diagram drawn as an image, or None if it
+                               was drawn as lines.
+    """
+
+    #Only a window backed by Tk can show an image.
+    if BLIT and hasattr(window, "_tkwin"):
+        raster = RasterCanvas(width, height)
+        rasterise_sankey(layout, raster, width, height)
+        blit_raster(window, raster)
+        return None, raster
+    recording = RecordingCanvas()
+    rasterise_sankey(layout, recording, width, height)
+    recording.optimise()
+    recording.replay(window.canvas())
+    return recording, None
+
+def bind_resize(window, layout, recording, raster):
+    """Lets the window be resized, redrawing the diagram at the new size
+    once the window has stopped changing for RESIZE_DELAY ms. Windows that
+    are not backed by Tk are left as they are.
+
+    If RESIZE_SCALE is False, every flow is drawn again from the layout at
+    the new size, which takes as long as drawing the diagram did. If it is
+    True, the image of the diagram as first drawn is scaled to the new size
+    instead, which takes time in proportion to the size of the window rather
+    than to the number of flows, and only the titles are written again. This
+    is an approximation: the flows are shown as one image, and are blocky
+    when the window is made larger.
+
+    Args:
+        window (GraphicsWindow): contains the graph
+        layout (SankeyLayout): The layout made by layout_sankey.
+        recording (RecordingCanvas): The diagram as drawn by show_layout, or
+                                     None if it was drawn as an image.
+        raster (RasterCanvas): The diagram as drawn by show_layout, or None
+                               if it was drawn as lines.
+    """
+
+    #ezgraphics does not pass on resize events, so the Tk window and canvas
+    ##underneath the GraphicsWindow are used directly.
+    tk_window = getattr(window, "_tkwin", None)
+    if tk_window is None:
+        return
+    tk_canvas = window.canvas()._tkcanvas
+    tk_window.resizable(True, True)
+    drawn_size = [WIDTH, HEIGHT]
+    pending = []
+    #The image to scale is only made from the recording on the first resize,
+    ##so a window that is never resized does not pay for it.
+    image = [raster]
+
+    def redraw():
+        pending.clear()
+        width = tk_window.winfo_width()
+        height = tk_window.winfo_height()
+        if [width, height] == drawn_size:
+            return
+        drawn_size[:] = [width, height]
+        tk_canvas.config(width=width, height=height)
+        tk_canvas.delete("all")
+        if not RESIZE_SCALE:
+            show_layout(window, layout, width, height)
+            return
+        if image[0] is None:
+            image[0] = RasterCanvas(WIDTH, HEIGHT)
+            recording.replay(image[0])
+        blit_raster(window, image[0].scaled(width, height))
+        write_layout_text(layout, window.canvas(), width, height)
+
+    def resized(event):
+        #Events from the canvas inside the window are ignored, as is any
+        ##event that leaves the size unchanged (for example, moving it).
+        if event.widget is not tk_window:
+            return
+        if [event.width, event.height] == drawn_size:
+            return
+        if pending:
+            tk_window.after_cancel(pending.pop())
+        pending.append(tk_window.after(RESIZE_DELAY, redraw))
+
+    tk_window.bind("<Configure>", resized, add="+")
+
+class HitIndex:
+    """Finds which flow, triangle or source block is under a point, without
+    asking Tk to search through every line on the canvas.
+
+    The flows are split into HOVER_STRIPS horizontal strips, and each strip
+    into HOVER_COLUMNS columns across the window. Each column lists the
+    flows whose x range inside the strip reaches it, the flow drawn last
+    first. A point is found by checking only the flows listed in its column,
+    stopping at the first one it is inside, which is the flow on top. The
+    work for a point is therefore bounded by how many flows pass through one
+    column of one strip, not by how many flows lie to its left. The source
+    blocks and triangles are already sorted from left to right, so they are
+    found with a bisect. Everything is in the layout's fractions of the
+    window size, so the index does not change when the window is resized.
+
+    Attributes:
+        layout (SankeyLayout): The layout the index was built from.
+        position (function): curve_position or straight_position, whichever
+                             the flows are drawn with.
+        source_lefts (list): Left of each source block, left to right.
+        dest_lefts (list): Left of each triangle, left to right.
+        strip_columns (list): For each strip built so far, the flows listed
+                              in each of its columns.
+    """
+
+    __slots__ = ("layout", "position", "source_lefts", "dest_lefts",
+                 "strip_columns")
+
+    def __init__(self, layout, complete=True):
+        """Sets up the index for a layout.
+
+        Args:
+            layout (SankeyLayout): The layout made by layout_sankey.
+            complete (boolean): Builds every strip straight away if True.
+                                Otherwise the strips are left to build.
+        """
+
+        self.layout = layout
+        self.position = curve_position if CURVED else straight_position
+        self.source_lefts = [layout.source_x[s] for s in layout.source_order]
+        self.dest_lefts = [layout.dest_x[d] for d in layout.dest_order]
+        self.strip_columns = []
+        if complete:
+            for step in self.build():
+                pass
+
+    def build(self):
+        """Builds the strips of the index from top to bottom. This is a
+        generator which pauses after every HOVER_BATCH flows added, so that
+        the index can be built a piece at a time between other work. Until a
+        strip is finished, find does not look for flows in it.
+        """
+
+        layout = self.layout
+        #The flows are listed in the reverse of the order they are drawn,
+        ##so the first one found under a point is the one on top.
+        order = [e for i in layout.dest_order for e in layout.dest_edges[i]]
+        order.reverse()
+        #How far each flow has moved from its source to its destination at
+        ##the edge of each strip, found once for every flow to share.
+        eased = [self.position(0, 1, strip / HOVER_STRIPS)
+                 for strip in range(0, HOVER_STRIPS + 1)]
+        added = 0
+        for strip in range(len(self.strip_columns), HOVER_STRIPS):
+            #The flows only ever move one way, so the x range of a flow in
+            ##a strip lies between its positions at the top and bottom.
+            ease_top = eased[strip]
+            ease_bottom = eased[strip + 1]
+            columns = [array("I") for column in range(0, HOVER_COLUMNS)]
+            for e in order:
+                move = layout.edge_dest_x[e] - layout.edge_source_x[e]
+                x_top = layout.edge_source_x[e] + ease_top * move
+                x_bottom = layout.edge_source_x[e] + ease_bottom * move
+                first = math.floor(min(x_top, x_bottom) * HOVER_COLUMNS)
+                last = math.floor((max(x_top, x_bottom) +
+                                   layout.edge_widths[e]) * HOVER_COLUMNS)
+                for column in range(max(first, 0),
+                                    min(last, HOVER_COLUMNS - 1) + 1):
+                    columns[column].append(e)
+                added = added + 1
+                if added % HOVER_BATCH == 0:
+                    yield
+            self.strip_columns.append(columns)
+
+    def find(self, x, y, width, height):
+        """Finds what is under a point on the canvas.
+
+        Args:
+            x (float): x position of the point in pixels.
+            y (float): y position of the point in pixels.
+            width (integer): Width the diagram is drawn at in pixels.
+            height (integer): Height the diagram is drawn at in pixels.
+
+        Returns:
+            hit (tuple): ("source", index), ("dest", index) or ("flow", index)
+                         for what is under the point, or None. Flows in
+                         strips that have not been built yet are not found.
+        """
+
+        layout = self.layout
+        x = x / width
+        y = y / height
+        if layout.source_top <= y <= layout.source_bottom:
+            k = bisect.bisect_right(self.source_lefts, x) - 1
+            if k >= 0:
+                source = layout.source_order[k]
+                if x <= layout.source_x[source] + layout.source_widths[source]:
+                    return ("source", source)
+        elif layout.source_bottom < y < layout.tri_top:
+            p = ((y - layout.source_bottom) /
+                 (layout.tri_top - layout.source_bottom))
+            strip = min(int(p * HOVER_STRIPS), HOVER_STRIPS - 1)
+            if strip >= len(self.strip_columns):
+                return None
+            column = min(max(math.floor(x * HOVER_COLUMNS), 0),
+                         HOVER_COLUMNS - 1)
+            #How far every flow has moved at this height is the same, so it
+            ##is found once rather than for each flow checked.
+            eased = self.position(0, 1, p)
+            source_x = layout.edge_source_x
+            dest_x = layout.edge_dest_x
+            widths = layout.edge_widths
+            for e in self.strip_columns[strip][column]:
+                left = source_x[e] - eased * (source_x[e] - dest_x[e])
+                if left <= x <= left + widths[e]:
+                    return ("flow", e)
+        elif layout.tri_top <= y <= layout.tri_bottom:
+            k = bisect.bisect_right(self.dest_lefts, x) - 1
+            if k >= 0:
+                dest = layout.dest_order[k]
+                #The triangle narrows to a point at the bottom.
+                half_width = layout.dest_widths[dest] / 2
+                t = ((y - layout.tri_top) /
+                     (layout.tri_bottom - layout.tri_top))
+                if (abs(x - (layout.dest_x[dest] + half_width)) <=
+                    (1 - t) * half_width):
+                    return ("dest", dest)
+        return None
+
+def hover_text(layout, hit):
+    """Writes the tooltip for something found by HitIndex.find.
+
+    Args:
+        layout (SankeyLayout): The layout the hit was found in.
+        hit (tuple): The hit returned by HitIndex.find.
+
+    Returns:
+        text (string): Its name, value and share of the total flow.
+    """
+
+    flows = layout.flows
+    kind, index = hit
+    if kind == "source":
+        name = layout.source_titles[index].strip()
+        value = layout.source_totals[index]
+    elif kind == "dest":
+        name = flows.names[index].strip()
+        value = flows.values[index]
+    else:
+        source, dest, value = flows.edge(index)
+        name = (layout.source_titles[source].strip() + " -> " +
+                flows.names[dest].strip())
+    share = 100 * value / layout.total_flow
+    return f"{name}\n{value:g} ({share:.1f}% of {layout.total_flow:g})"
+
+def bind_hover(window, layout):
+    """Shows a tooltip with the name, value and share of the total flow of
+    whatever the mouse is over. Windows that are not backed by Tk are left
+    as they are.
+
+    Args:
+        window (GraphicsWindow): contains the graph
+        layout (SankeyLayout): The layout made by layout_sankey.
+    """
+
+    tk_window = getattr(window, "_tkwin", None)
+    if tk_window is None:
+        return
+    tk_canvas = window.canvas()._tkcanvas
+    #The index is built a piece at a time whenever Tk has nothing else to
+    ##do, starting once the diagram has been drawn, so building it never
+    ###holds up drawing or a mouse movement for long.
+    index = HitIndex(layout, False)
+    pieces = index.build()
+
+    def build_piece():
+        for step in pieces:
+            tk_window.after_idle(build_piece)
+            return
+
+    def moved(event):
+        tk_canvas.delete("tooltip")
+        hit = index.find(event.x, event.y, tk_canvas.winfo_width(),
+                         tk_canvas.winfo_height())
+        if hit is None:
+            return
+        #The tooltip is kept inside the window, below and to the right of
+        ##the mouse where there is room.
+        text = tk_canvas.create_text(event.x + 12, event.y + 12, anchor="nw",
+                                     text=hover_text(layout, hit),
+                                     tags="tooltip")
+        x1, y1, x2, y2 = tk_canvas.bbox(text)
+        dx = min(0, tk_canvas.winfo_width() - x2 - 4)
+        dy = min(0, tk_canvas.winfo_height() - y2 - 4)
+        if dx or dy:
+            tk_canvas.move(text, dx if dx > -x1 else -x1,
+                           dy if dy > -y1 else -y1)
+            x1, y1, x2, y2 = tk_canvas.bbox(text)
+        background = tk_canvas.create_rectangle(x1 - 3, y1 - 2, x2 + 3,
+                                                y2 + 2, fill="lightyellow",
+                                                outline="black",
+                                                tags="tooltip")
+        tk_canvas.tag_lower(background, text)
+
+    tk_canvas.bind("<Motion>", moved, add="+")
+    tk_canvas.bind("<Leave>", lambda event: tk_canvas.delete("tooltip"),
+                   add="+")
+    tk_window.after_idle(build_piece)
+
+def draw_sankey(window, title, data_dic, gap_size = 100, border_size = 100):
+    """Draw the sankey diagram
+
+    Args:
+        window (GraphicsWindow): contains the graph
+        title (string): contains the label to overlay on the source arrow
+        data_dic (FlowModel): contains the data for the graph
+        gap_size (int): number of pixels to leave between destination arrows
+        border_size (int): Minimum separation to othe edges of the window
+
+    Raises:
+        Exception: If the number of available pixels calculated is less than
+                   one pixel.
+
+    Returns:
+        recording (RecordingCanvas): The commands used to draw the diagram,
+                                     which can be saved or replayed. This is
+                                     None if BLIT is True.
+    """
 
-    #The source axis label/title is written. If is_colours_extended is true
-    ##and colours were used, the source title will be coloured as well.
-    source_title_write(title, source_width, is_colours_extended, canvas,
-                       source_height, border_size)   
+    #The layout is worked out once, so resizing the window only draws it
+    ##again (or scales the image of it, see RESIZE_SCALE) at the new size.
+    layout = layout_sankey(title, data_dic, gap_size, border_size)
+    recording, raster = show_layout(window, layout, WIDTH, HEIGHT)
+    bind_resize(window, layout, recording, raster)
+    bind_hover(window, layout)
+    return recording
         
 def main():
     # DO NOT EDIT THIS CODE ###
@@ -0,0 +1,352 @@
+import os
+import random
+import subprocess
+import sys
+
+import sankey
+
+#Directory holding sankey.py, so the subprocesses import this copy of it.
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+#Upper limit in microseconds for the cumulative import time of sankey, as
+##reported by python -X importtime. A warm import takes well under this on
+###a typical machine, the margin is for slow or busy test runners.
+IMPORT_BUDGET = 100000
+
+
+def test_import_budget():
+    """Checks that importing sankey stays within IMPORT_BUDGET and does not
+    pull in tkinter (through ezgraphics) or NumPy."""
+    check = ("import sys, sankey; "
+             "assert 'tkinter' not in sys.modules, 'tkinter imported'; "
+             "assert 'numpy' not in sys.modules, 'numpy imported'")
+    #Run twice so the second run is measured with the bytecode cached.
+    for attempt in range(2):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                                 check], cwd=HERE, capture_output=True,
+                                text=True)
+    assert result.returncode == 0, result.stderr
+    lines = [line for line in result.stderr.splitlines()
+             if line.rstrip().endswith("| sankey")]
+    assert len(lines) == 1, result.stderr
+    cumulative = int(lines[0].split("|")[1])
+    assert cumulative < IMPORT_BUDGET, cumulative
+
+
+def test_name_table():
+    """Checks that names read back from a NameTable match those stored."""
+    names = ["Oil", "", "Côte d'Ivoire", "Flow 7"]
+    table = sankey.NameTable()
+    for name in names:
+        table.append(name)
+    assert len(table) == len(names)
+    assert list(table) == names
+    assert table[2] == names[2] and table[-1] == names[-1]
+
+
+def test_parse_line_sources():
+    """Checks that only "source -> destination" lines name their own source
+    and that lines which do not fit either format are rejected."""
+    assert sankey.parse_line("Oil -> Transport, 52, 1, 2", 3) == (
+        "Oil", "Transport", 52.0, [1, 2])
+    assert sankey.parse_line("Oil, 2018, 5", 3) == (None, "Oil", 2018.0, [5])
+    for line in ["France, 1O, 3", " -> Homes, 3", "A -> B -> C, 3"]:
+        try:
+            sankey.parse_line(line, 3)
+        except Exception:
+            pass
+        else:
+            raise AssertionError(line)
+
+
+def test_shorten_label_fits_room():
+    """Checks that a shortened label always fits in the width it was given
+    and that a label with no room at all comes back as None."""
+    text = "Electricity Generation"
+    assert sankey.shorten_label(text, 1000) == text
+    for room in range(0, 200):
+        short_text = sankey.shorten_label(text, room)
+        if short_text is None:
+            assert room < 4 * sankey.CHAR_WIDTH
+        else:
+            assert sankey.estimate_text_width(short_text) <= room, room
+
+
+def test_place_labels_do_not_overlap():
+    """Checks that labels placed from heavily overlapping positions never
+    overlap on any row, and that hidden labels come back as None."""
+    rng = random.Random(2)
+    labels = [(rng.randint(0, 300), 500, "Label " * rng.randint(1, 4))
+              for k in range(0, 60)]
+    placed = sankey.place_labels(labels)
+    assert len(placed) == len(labels)
+    rows = {}
+    for (x, y, text), (placed_x, row_y, short_text) in zip(labels, placed):
+        assert placed_x == x
+        assert row_y in [y + r * sankey.TEXT_HEIGHT
+                         for r in range(0, sankey.LABEL_ROWS)]
+        if short_text is None:
+            continue
+        assert short_text == text or short_text.endswith("...")
+        half = sankey.estimate_text_width(short_text) / 2
+        rows.setdefault(row_y, []).append((x - half, x + half))
+    assert any(text is None for x, y, text in placed)
+    for spans in rows.values():
+        spans.sort()
+        for (left, right), (next_left, next_right) in zip(spans, spans[1:]):
+            assert right + sankey.LABEL_PAD <= next_left
+
+
+def random_flows(rng, number_sources, number_dests, number_lines):
+    """Returns a FlowModel of random lines between the given numbers of
+    sources and destinations. Sources are only named if there is more than
+    one."""
+    lines = []
+    for k in range(0, number_lines):
+        line = f"D{rng.randrange(number_dests)}, {rng.randint(1, 99)}"
+        if number_sources > 1:
+            line = f"S{rng.randrange(number_sources)} -> " + line
+        lines.append(line)
+    return sankey.process_data(lines)
+
+
+def crossings(flows, source_order, dest_order):
+    """Counts the pairs of flows which cross by checking every pair."""
+    source_pos = {source: n for n, source in enumerate(source_order)}
+    dest_pos = {dest: n for n, dest in enumerate(dest_order)}
+    ends = [(source_pos[source], dest_pos[dest]) for source, dest, value
+            in map(flows.edge, range(0, flows.edge_count()))]
+    return sum(1 for a in range(0, len(ends)) for b in range(0, len(ends))
+               if ends[a][0] < ends[b][0] and ends[a][1] > ends[b][1])
+
+
+def test_count_crossings_matches_brute_force():
+    """Checks count_crossings against checking every pair of flows, for
+    random flows and random orders."""
+    rng = random.Random(3)
+    for attempt in range(0, 40):
+        flows = random_flows(rng, rng.randint(2, 6), rng.randint(1, 8),
+                             rng.randint(1, 30))
+        source_order = list(range(1, len(flows.source_names)))
+        dest_order = list(range(0, len(flows)))
+        rng.shuffle(source_order)
+        rng.shuffle(dest_order)
+        source_pos = [0] * len(flows.source_names)
+        for n, source in enumerate(source_order):
+            source_pos[source] = n
+        dest_pos = [0] * len(flows)
+        for n, dest in enumerate(dest_order):
+            dest_pos[dest] = n
+        edge_sources, edge_dests, edge_values = flows.edge_columns()
+        edge_order = sorted(range(0, len(edge_values)),
+                            key=lambda e: (source_pos[edge_sources[e]],
+                                           dest_pos[edge_dests[e]]))
+        assert sankey.count_crossings(
+            edge_order, source_pos, dest_pos, edge_sources,
+            edge_dests) == crossings(flows, source_order, dest_order)
+
+
+def test_order_flows_never_adds_crossings():
+    """Checks that order_flows never crosses more flows than the file order
+    does, and keeps the file order when there is only one source."""
+    rng = random.Random(4)
+    for attempt in range(0, 40):
+        flows = random_flows(rng, rng.randint(2, 8), rng.randint(2, 12),
+                             rng.randint(1, 60))
+        sources = list(range(1, len(flows.source_names)))
+        source_order, dest_order = sankey.order_flows(flows, sources)
+        assert sorted(source_order) == sources
+        assert sorted(dest_order) == list(range(0, len(flows)))
+        assert (crossings(flows, source_order, dest_order) <=
+                crossings(flows, sources, range(0, len(flows))))
+    flows = random_flows(rng, 1, 12, 40)
+    assert sankey.order_flows(flows, [0]) == ([0], list(range(0, len(flows))))
+
+
+def diagram_layout(file_name):
+    """Returns the layout of one of the files in Data, with the colours
+    chosen the same way every time."""
+    colours = list(sankey.COLOURS)
+    random.seed(0)
+    try:
+        title, axis, data = sankey.read_file(os.path.join(HERE, "Data",
+                                                          file_name))
+        return sankey.layout_sankey(axis, sankey.process_data(data),
+                                    sankey.GAP, 100)
+    finally:
+        sankey.COLOURS[:] = colours
+
+
+def record_diagram(file_name, width, height):
+    """Returns a RecordingCanvas of one of the files in Data drawn at the
+    given size."""
+    recording = sankey.RecordingCanvas()
+    sankey.rasterise_sankey(diagram_layout(file_name), recording, width,
+                            height)
+    return recording
+
+
+def test_optimise_keeps_pixels():
+    """Checks that an optimised recording draws exactly the same pixels as
+    the recording it was made from."""
+    for file_name in sorted(os.listdir(os.path.join(HERE, "Data"))):
+        for width, height in [(sankey.WIDTH, sankey.HEIGHT), (613, 457)]:
+            recording = record_diagram(file_name, width, height)
+            raw = sankey.RasterCanvas(width, height)
+            recording.replay(raw)
+            recording.optimise()
+            assert any(c[0] == "span" and c[5] > 1
+                       for c in recording.commands)
+            optimised = sankey.RasterCanvas(width, height)
+            recording.replay(optimised)
+            assert raw.pixels == optimised.pixels, file_name
+
+
+def test_direct_raster_matches_recording():
+    """Checks that drawing a layout straight into a RasterCanvas, as BLIT
+    does, gives the same pixels as replaying its optimised recording."""
+    for file_name in sorted(os.listdir(os.path.join(HERE, "Data"))):
+        recording = record_diagram(file_name, sankey.WIDTH, sankey.HEIGHT)
+        recording.optimise()
+        replayed = sankey.RasterCanvas(sankey.WIDTH, sankey.HEIGHT)
+        recording.replay(replayed)
+        direct = sankey.RasterCanvas(sankey.WIDTH, sankey.HEIGHT)
+        sankey.rasterise_sankey(diagram_layout(file_name), direct,
+                                sankey.WIDTH, sankey.HEIGHT)
+        assert direct.pixels == replayed.pixels, file_name
+
+
+def test_saved_recording_keeps_pixels(tmp_path):
+    """Checks that a recording saved to a file and loaded again draws the
+    same pixels and text as the recording it was saved from."""
+    saved_name = str(tmp_path / "diagram.json")
+    for file_name in sorted(os.listdir(os.path.join(HERE, "Data"))):
+        recording = record_diagram(file_name, sankey.WIDTH,
+                                   sankey.HEIGHT)
+        recording.optimise()
+        recording.save(saved_name)
+        loaded = sankey.RecordingCanvas.load(saved_name)
+        assert loaded.commands == recording.commands
+        before = sankey.RasterCanvas(sankey.WIDTH, sankey.HEIGHT)
+        recording.replay(before)
+        after = sankey.RasterCanvas(sankey.WIDTH, sankey.HEIGHT)
+        loaded.replay(after)
+        assert after.pixels == before.pixels, file_name
+        assert after.texts == before.texts, file_name
+
+
+def test_svg_canvas_writes_svg(tmp_path):
+    """Checks that a recording replayed into an SvgCanvas saves a well
+    formed SVG file with an element for each thing drawn."""
+    import xml.etree.ElementTree as ElementTree
+    recording = record_diagram("Energy_Flows.txt", sankey.WIDTH,
+                               sankey.HEIGHT)
+    recording.optimise()
+    svg = sankey.SvgCanvas(sankey.WIDTH, sankey.HEIGHT)
+    recording.replay(svg)
+    file_name = str(tmp_path / "diagram.svg")
+    svg.save(file_name)
+    root = ElementTree.parse(file_name).getroot()
+    assert root.tag == "{http://www.w3.org/2000/svg}svg"
+    assert root.get("width") == str(sankey.WIDTH)
+    assert root.get("height") == str(sankey.HEIGHT)
+    #The first rect is the white background.
+    assert len(root) == len(svg.elements) + 1
+    tags = {element.tag.split("}")[1] for element in root}
+    assert {"line", "rect", "polygon", "text"} <= tags
+    texts = [element.text for element in root if element.tag.endswith("text")]
+    assert "Imports" in texts
+
+
+def test_scaled_picks_nearest_pixel():
+    """Checks that a framebuffer scaled to twice its size repeats every pixel
+    across and down, and that scaling to the same size changes nothing."""
+    raster = sankey.RasterCanvas(7, 5)
+    raster.pixels[:] = bytes(range(0, 7 * 5 * 3))
+    assert raster.scaled(7, 5).pixels == raster.pixels
+    doubled = raster.scaled(14, 10)
+    for y in range(0, 10):
+        for x in range(0, 14):
+            new = (y * 14 + x) * 3
+            old = ((y // 2) * 7 + x // 2) * 3
+            assert doubled.pixels[new:new + 3] == raster.pixels[old:old + 3]
+
+
+def test_hit_index_matches_brute_force(monkeypatch):
+    """Checks HitIndex.find against checking every flow, drawn curved and
+    straight, at points across the whole height of the flows."""
+    for curved in [True, False]:
+        monkeypatch.setattr(sankey, "CURVED", curved)
+        layout = diagram_layout("Energy_Flows.txt")
+        index = sankey.HitIndex(layout)
+        position = (sankey.curve_position if curved
+                    else sankey.straight_position)
+        drawn = [e for i in layout.dest_order for e in layout.dest_edges[i]]
+        found = set()
+        for row in range(1, 100):
+            y = (layout.source_bottom + (layout.tri_top - layout.source_bottom)
+                 * row / 100)
+            p = (y - layout.source_bottom) / (layout.tri_top -
+                                              layout.source_bottom)
+            for column in range(0, 500):
+                x = column / 500
+                expected = None
+                for e in drawn:
+                    left = position(layout.edge_source_x[e],
+                                    layout.edge_dest_x[e], p)
+                    if left <= x <= left + layout.edge_widths[e]:
+                        expected = ("flow", e)
+                assert index.find(x, y, 1, 1) == expected, (curved, x, y)
+                found.add(expected)
+        assert len(found) == len(drawn) + 1
+
+
+def test_hover_text():
+    """Checks the tooltips written for a source block, a triangle and a
+    flow."""
+    layout = diagram_layout("Energy_Flows.txt")
+    index = sankey.HitIndex(layout)
+    sources = list(layout.flows.source_names)
+    oil = sources.index("Oil")
+    y = (layout.source_top + layout.source_bottom) / 2
+    x = layout.source_x[oil] + layout.source_widths[oil] / 2
+    hit = index.find(x, y, 1, 1)
+    assert hit == ("source", oil)
+    assert sankey.hover_text(layout, hit) == "Oil\n59 (38.3% of 154)"
+    homes = list(layout.flows.names).index("Homes")
+    x = layout.dest_x[homes] + layout.dest_widths[homes] / 2
+    hit = index.find(x, layout.tri_top, 1, 1)
+    assert hit == ("dest", homes)
+    assert sankey.hover_text(layout, hit) == "Homes\n44 (28.6% of 154)"
+    assert sankey.hover_text(layout, ("flow", 0)) == (
+        "Oil -> Transport\n52 (33.8% of 154)")
+
+
+def test_parallel_read_matches_serial(tmp_path, monkeypatch):
+    """Checks that read_file_parallel builds the same model as process_data
+    from a file mixing new flows, repeated flows and coloured lines."""
+    rng = random.Random(1)
+    lines = ["Title", "Axis"]
+    for k in range(0, 3000):
+        #Names starting with "n" check that only new lines are stripped.
+        flow = f"{rng.choice('Dn')}{rng.randint(0, 30)}, {rng.randint(1, 99)}"
+        if rng.random() < 0.6:
+            flow = f"{rng.choice('Sn')}{rng.randint(0, 300)} -> " + flow
+        if rng.random() < 0.1:
+            flow = flow + f", {rng.randint(0, 255)}, {rng.randint(0, 255)}"
+        lines.append(flow)
+    file_name = str(tmp_path / "mixed.txt")
+    with open(file_name, "w") as file:
+        file.write("\n".join(lines) + "\n")
+    monkeypatch.setattr(sankey, "PARALLEL_MIN_BYTES", 0)
+
+    def columns(flows):
+        return (list(flows.names), list(flows.source_names), flows.values,
+                flows.rgb, flows.rgb_len,
+                [list(column) for column in flows.edge_columns()])
+
+    serial = sankey.process_data(sankey.read_file(file_name)[2])
+    assert "n0" in list(serial.names) and "n0" in list(serial.source_names)
+    for workers in [1, 3]:
+        title, axis, flows = sankey.read_file_parallel(file_name, workers)
+        assert columns(flows) == columns(serial)